@@ -1,146 +1,28 @@
 import streamlit as st
-import pulp
 
-# Function to run optimization for scenario 1 (V1, V2, V3)
-def optimize_scenario_1(D_a, D_b, D_c):
-    v1_deliveries_per_day = 64
-    v2_deliveries_per_day = 66
-    v3_deliveries_per_day = 72
-
-    cost_v1 = 62.8156
-    cost_v2 = 33
-    cost_v3 = 29.0536
-
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V2 = pulp.LpVariable('V2', lowBound=0, cat='Integer')
-    V3 = pulp.LpVariable('V3', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A2 = pulp.LpVariable('A2', lowBound=0, cat='Continuous')
-    B2 = pulp.LpVariable('B2', lowBound=0, cat='Continuous')
-    A3 = pulp.LpVariable('A3', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v2 * V2 + cost_v3 * V3, "Total Cost"
-
-    lp_problem += A1 + A2 + A3 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 + B2 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
+import fleet_optimizer
+from perf_trace import enabled_by_default, performance_panel, start_run
 
-    lp_problem += 64 * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += 66 * V2 >= B2 + A2, "V2_Capacity_Constraint"
-    lp_problem += 72 * V3 >= A3, "V3_Capacity_Constraint"
+# Performance tracing for this run, shown in the panel at the end of the page
+perf_run = start_run("app101.py", enabled=st.sidebar.checkbox("Record performance", value=enabled_by_default()))
 
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= 64 * V1 - C1, "Assign_B_To_V1"
-    lp_problem += B2 == D_b - B1, "Assign_Remaining_B_To_V2"
-    lp_problem += A1 <= 64 * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A2 <= 66 * V2 - B2, "Assign_A_To_V2"
-    lp_problem += A3 == D_a - A1 - A2, "Assign_Remaining_A_To_V3"
+# Fixed vehicle costs (USD per day) and capacities (deliveries per day) used by this app
+COSTS = {"V1": 62.8156, "V2": 33, "V3": 29.0536}
+CAPACITIES = {"V1": 64, "V2": 66, "V3": 72}
 
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V2": pulp.value(V2),
-        "V3": pulp.value(V3),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V2": pulp.value(B2 + A2),
-        "Deliveries assigned to V3": pulp.value(A3)
-    }
+# Function to run optimization for scenario 1 (V1, V2, V3)
+def optimize_scenario_1(D_a, D_b, D_c):
+    return fleet_optimizer.optimize_scenario_1(
+        D_a, D_b, D_c, COSTS["V1"], COSTS["V2"], COSTS["V3"], CAPACITIES["V1"], CAPACITIES["V2"], CAPACITIES["V3"]
+    )
 
 # Function to run optimization for scenario 2 (V1, V2)
 def optimize_scenario_2(D_a, D_b, D_c):
-    v1_deliveries_per_day = 64
-    v2_deliveries_per_day = 66
-
-    cost_v1 = 62.8156
-    cost_v2 = 33
-
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V2 = pulp.LpVariable('V2', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A2 = pulp.LpVariable('A2', lowBound=0, cat='Continuous')
-    B2 = pulp.LpVariable('B2', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v2 * V2, "Total Cost"
-
-    lp_problem += A1 + A2 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 + B2 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
-
-    lp_problem += 64 * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += 66 * V2 >= B2 + A2, "V2_Capacity_Constraint"
-
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= 64 * V1 - C1, "Assign_B_To_V1"
-    lp_problem += B2 == D_b - B1, "Assign_Remaining_B_To_V2"
-    lp_problem += A1 <= 64 * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A2 == D_a - A1, "Assign_Remaining_A_To_V2"
-
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V2": pulp.value(V2),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V2": pulp.value(B2 + A2)
-    }
+    return fleet_optimizer.optimize_scenario_2(D_a, D_b, D_c, COSTS["V1"], COSTS["V2"], CAPACITIES["V1"], CAPACITIES["V2"])
 
 # Function to run optimization for scenario 3 (V1, V3)
 def optimize_scenario_3(D_a, D_b, D_c):
-    v1_deliveries_per_day = 64
-    v3_deliveries_per_day = 72
-
-    cost_v1 = 62.8156
-    cost_v3 = 29.0536
-
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V3 = pulp.LpVariable('V3', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A3 = pulp.LpVariable('A3', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v3 * V3, "Total Cost"
-
-    lp_problem += A1 + A3 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
-
-    lp_problem += 64 * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += 72 * V3 >= A3, "V3_Capacity_Constraint"
-
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= 64 * V1 - C1, "Assign_B_To_V1"
-    lp_problem += A1 <= 64 * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A3 == D_a - A1, "Assign_Remaining_A_To_V3"
-
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V3": pulp.value(V3),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V3": pulp.value(A3)
-    }
+    return fleet_optimizer.optimize_scenario_3(D_a, D_b, D_c, COSTS["V1"], COSTS["V3"], CAPACITIES["V1"], CAPACITIES["V3"])
 
 # Streamlit app
 st.title("Delivery Cost Optimization")
@@ -174,3 +56,6 @@ if st.button("Optimize"):
         st.write(f"Deliveries assigned to V2: {result['Deliveries assigned to V2']}")
     if "Deliveries assigned to V3" in result:
         st.write(f"Deliveries assigned to V3: {result['Deliveries assigned to V3']}")
+
+# Timing spans of this run
+performance_panel(perf_run)
@@ -1,63 +1,34 @@
-import streamlit as st
 import pandas as pd
-import pulp
-
-# Define the load optimization function
-def load_optimization(D_a, D_b, D_c, W_a, W_b, W_c, max_v1, max_v2, max_v3):
-    # New weight capacities
-    new_weight_capacity_v1 = 1000  # kg per day for v1
-    new_weight_capacity_v2 = 500   # kg per day for v2
-    new_weight_capacity_v3 = 60    # kg per day for v3
-
-    # New delivery capacities based on time constraints
-    v1_deliveries_per_day = 64
-    v2_deliveries_per_day = 66
-    v3_deliveries_per_day = 72
-
-    # New costs with incentive
-    cost_v1 = 62.8156
-    cost_v2 = 33
-    cost_v3 = 29.0536
-
-    # Create a linear programming problem
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    # Define decision variables
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V2 = pulp.LpVariable('V2', lowBound=0, cat='Integer')
-    V3 = pulp.LpVariable('V3', lowBound=0, cat='Integer')
-
-    # Objective function
-    lp_problem += cost_v1 * V1 + cost_v2 * V2 + cost_v3 * V3, "Total Cost"
-
-    # Constraints
-    lp_problem += v1_deliveries_per_day * V1 >= D_c, "V1_Delivery_Constraint"
-    lp_problem += v2_deliveries_per_day * V2 >= D_b, "V2_Delivery_Constraint"
-    lp_problem += v3_deliveries_per_day * V3 >= D_a, "V3_Delivery_Constraint"
+import streamlit as st
 
-    lp_problem += new_weight_capacity_v1 * V1 >= W_c, "V1_Weight_Constraint"
-    lp_problem += new_weight_capacity_v2 * V2 >= W_b, "V2_Weight_Constraint"
-    lp_problem += new_weight_capacity_v3 * V3 >= W_a, "V3_Weight_Constraint"
+from fleet_optimizer import load_optimization, load_precheck
+from job_queue import job_status, start_job
+from manifest_io import WEIGHT_COLUMN, open_workbook
+from parcel_packing import LOAD_VEHICLES, load_parcels, vehicle_loads
+from perf_trace import enabled_by_default, performance_panel, start_run
+from solver_config import DEFAULT_TIME_LIMIT, available_backends
+from weight_classes import OPEN_ENDED_EDGES
 
-    # Constraint to ensure no more than 1 vehicle is underutilized
-    lp_problem += V1 + V2 + V3 - pulp.lpSum([pulp.lpSum([V1, V2, V3]) <= 1 for _ in range(3)]), "Underutilized_Vehicle_Constraint"
+# Rows per page offered by the input data preview
+PAGE_SIZES = (50, 100, 500, 1000)
 
-    # Manual input constraints for maximum number of each type of vehicle available
-    lp_problem += V1 <= max_v1, "Max_V1_Constraint"
-    lp_problem += V2 <= max_v2, "Max_V2_Constraint"
-    lp_problem += V3 <= max_v3, "Max_V3_Constraint"
 
-    # Solve the problem
-    lp_problem.solve()
+# Show one page of a sheet's weight column; only that slice of the (memory-mapped) column
+# is read and sent to the browser, however many rows the manifest has
+def weight_preview(array, key):
+    rows = len(array)
+    size_column, page_column = st.columns(2)
+    page_size = size_column.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    pages = max(1, -(-rows // page_size))
+    page = page_column.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page_{page_size}")
+    start = (page - 1) * page_size
+    stop = min(rows, start + page_size)
+    st.dataframe(pd.DataFrame({WEIGHT_COLUMN: array[start:stop]}, index=pd.RangeIndex(start + 1, stop + 1, name="Row")))
+    st.caption(f"Rows {start + 1 if rows else 0}-{stop} of {rows}")
 
-    # Results
-    status = pulp.LpStatus[lp_problem.status]
-    V1_value = pulp.value(V1)
-    V2_value = pulp.value(V2)
-    V3_value = pulp.value(V3)
-    total_cost = pulp.value(lp_problem.objective)
 
-    return status, V1_value, V2_value, V3_value, total_cost
+# Performance tracing for this run, shown in the panel at the end of the page
+perf_run = start_run("app5.py", enabled=st.sidebar.checkbox("Record performance", value=enabled_by_default()))
 
 # Streamlit app
 st.title("Load Optimization Model")
@@ -75,39 +46,69 @@ uploaded_file = st.file_uploader("Upload your input data (Excel)", type=["xlsx"]
 
 if uploaded_file is not None:
     try:
-        # Read the uploaded Excel file and get the sheet names
-        excel_file = pd.ExcelFile(uploaded_file)
-        sheet_names = excel_file.sheet_names
+        # Parse the uploaded workbook once and get the sheet names
+        workbook = open_workbook(uploaded_file)
+        sheet_names = workbook.sheet_names
         
         # Let the user select a sheet
         sheet_name = st.selectbox("Select the sheet to use", sheet_names)
         
-        # Read the selected sheet
-        df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-        st.write("Columns in the selected sheet:", df.columns.tolist())  # Debug output
+        # Read only the weight column of the selected sheet
+        weights = workbook.weight_array(sheet_name)
+        st.caption("Columns in the selected sheet: " + ", ".join(map(str, workbook.columns(sheet_name))))
 
-        if 'Weight (KG)' not in df.columns:
+        if weights is None:
             st.error("The selected sheet does not contain a 'Weight (KG)' column. Please select a valid sheet.")
         else:
-            # Extract and classify weights
-            weights = df['Weight (KG)']
-            D_a = len(weights[(weights > 0) & (weights <= 2)])
-            D_b = len(weights[(weights > 2) & (weights <= 10)])
-            D_c = len(weights[weights > 10])
+            # Classify weights and build the preview statistics in one pass; Type C has no
+            # upper limit here
+            totals = workbook.weight_summary(sheet_name, edges=OPEN_ENDED_EDGES)
+            D_a, D_b, D_c = (totals["counts"][t] for t in "ABC")
+            W_a, W_b, W_c = (totals["weights"][t] for t in "ABC")
 
-            W_a = weights[(weights > 0) & (weights <= 2)].sum()
-            W_b = weights[(weights > 2) & (weights <= 10)].sum()
-            W_c = weights[(weights > 10) & (weights <= 100)].sum()
-
-            # Display the input data
+            # Display the input data a page at a time, with statistics of the whole sheet
             st.subheader("Input Data")
-            st.write(df)
+            weight_preview(weights, key=f"preview_{workbook.digest}_{sheet_name}")
+            st.write(
+                f"Rows: {totals['rows']}, missing weights: {totals['missing']}, out of range: {totals['out_of_range']}, "
+                f"lightest: {totals['min']:.4g} kg, heaviest: {totals['max']:.4g} kg"
+            )
+            with st.expander("Weight histogram per delivery type"):
+                for label, histogram in totals["histograms"].items():
+                    edges, counts = histogram["edges"], histogram["counts"]
+                    st.write(f"Type {label}")
+                    bins = [f"{lo:.4g}-{hi:.4g}" for lo, hi in zip(edges[:-1], edges[1:])]
+                    st.bar_chart(pd.DataFrame({"Deliveries": counts}, index=pd.Index(bins, name="Weight (kg)")), sort=False)
 
             # Display classification results
             st.subheader("Classification Results")
             st.write(f"Type A Deliveries (0-2 kg): {D_a}, Total Weight: {W_a} kg")
             st.write(f"Type B Deliveries (2-10 kg): {D_b}, Total Weight: {W_b} kg")
             st.write(f"Type C Deliveries (>10 kg): {D_c}, Total Weight: {W_c} kg")
+            skipped = totals["out_of_range"] + totals["missing"]
+            if skipped:
+                st.warning(f"{skipped} rows had a missing or non-positive weight and were not classified.")
+
+            # Parcel-level loading with the actual weights instead of category totals
+            st.subheader("Parcel-level Loading")
+            refine = st.checkbox("Refine small vehicle groups with an exact MILP", value=False)
+            if st.button("Load Parcels onto Vehicles"):
+                start_job(
+                    "packing_job", load_parcels, weights, refine=refine,
+                    name="Parcel loading", context={"digest": workbook.digest, "sheet": sheet_name},
+                )
+            job_status("packing_job", "packing_results")
+            packing_results = st.session_state.get("packing_results")
+            # Only shown for the sheet it was computed for
+            if packing_results and (packing_results["digest"], packing_results["sheet"]) == (workbook.digest, sheet_name):
+                packing = packing_results["result"]
+                st.write(f"Status: {packing['Status']}")
+                for v in LOAD_VEHICLES:
+                    st.write(f"{v['name']}: {packing[v['name']]} (lower bound {packing['Lower bound ' + v['name']]})")
+                st.write(f"Total Cost: {packing['Total Cost']}")
+                if packing["Unassigned parcels"]:
+                    st.warning(f"{packing['Unassigned parcels']} parcels could not be loaded (no weight, or heavier than any vehicle can carry).")
+                st.dataframe(vehicle_loads(weights, packing))
 
     except Exception as e:
         st.error(f"An error occurred: {e}")
@@ -124,6 +125,13 @@ max_v1 = st.sidebar.number_input("Maximum number of V1 vehicles", min_value=0, v
 max_v2 = st.sidebar.number_input("Maximum number of V2 vehicles", min_value=0, value=0)
 max_v3 = st.sidebar.number_input("Maximum number of V3 vehicles", min_value=0, value=0)
 
+# Solver settings
+st.sidebar.header("Solver")
+backend = st.sidebar.selectbox("Solver backend", [b for b in available_backends() if b != "native"])
+time_limit = st.sidebar.number_input("Time limit (seconds)", min_value=1.0, value=float(DEFAULT_TIME_LIMIT or 60))
+gap = st.sidebar.number_input("Relative MIP gap", min_value=0.0, max_value=0.99, value=0.0, format="%.4f")
+threads = st.sidebar.number_input("Solver threads", min_value=1, value=1)
+
 # Descriptive message for vehicle types
 st.markdown("""
 ### Vehicle Type Descriptions:
@@ -138,8 +146,23 @@ if st.sidebar.button("Optimize with Manual Input"):
     W_b_manual = D_b_manual * 6    # Average weight for Type B (example)
     W_c_manual = D_c_manual * 15   # Average weight for Type C (example)
     
-    status, V1_value, V2_value, V3_value, total_cost = load_optimization(D_a_manual, D_b_manual, D_c_manual, W_a_manual, W_b_manual, W_c_manual, max_v1, max_v2, max_v3)
-    
+    # Vehicle limits that cannot cover the deliveries are reported without starting a solve
+    check = load_precheck(D_a_manual, D_b_manual, D_c_manual, W_a_manual, W_b_manual, W_c_manual, max_v1, max_v2, max_v3)
+    if not check["Feasible"]:
+        st.session_state.pop("load_results", None)
+        st.error("Infeasible with these vehicle limits:\n\n" + "\n".join(f"- {s}" for s in check["Shortfalls"]))
+    else:
+        start_job(
+            "load_job", load_optimization,
+            D_a_manual, D_b_manual, D_c_manual, W_a_manual, W_b_manual, W_c_manual, max_v1, max_v2, max_v3,
+            backend=backend, time_limit=time_limit, gap=gap or None, threads=threads, name="Load optimization",
+        )
+
+# The solve runs as a background job; its result stays on the page through later reruns
+job_status("load_job", "load_results")
+if "load_results" in st.session_state:
+    status, V1_value, V2_value, V3_value, total_cost, solve_time, mip_gap = st.session_state["load_results"]["result"]
+
     # Display the results
     st.subheader("Optimization Results with Manual Input")
     st.write(f"Status: {status}")
@@ -147,3 +170,7 @@ if st.sidebar.button("Optimize with Manual Input"):
     st.write(f"V2: {V2_value}")
     st.write(f"V3: {V3_value}")
     st.write(f"Total Cost: {total_cost}")
+    st.write(f"Solve time: {solve_time:.3f} s, MIP gap: {mip_gap if mip_gap is not None else 'n/a'}")
+
+# Timing spans of this run
+performance_panel(perf_run)
@@ -1,16 +1,40 @@
 import streamlit as st
-import pandas as pd
-import pulp
+
+from fleet_optimizer import (
+    SCENARIOS, greedy_scenario, native_is_quick, optimize_scenario_1, optimize_scenario_2, optimize_scenario_3,
+    scenarios_cached, solve_all_scenarios,
+)
+from job_queue import job_status, start_job
+from perf_trace import enabled_by_default, performance_panel, span, start_run
+from solver_config import DEFAULT_TIME_LIMIT, highs_available
+from sweep import INTEGER_PARAMETERS, PARAMETERS
+
+# pandas, altair, openpyxl and PuLP are imported where they are first needed, so the
+# first paint does not wait for them
+
+# Performance tracing for this run, shown in the panel at the end of the page
+perf_run = start_run("appog.py", enabled=st.sidebar.checkbox("Record performance", value=enabled_by_default()))
+
+# Parsed workbook of an upload, kept per upload so reruns neither re-read nor re-hash it
+# (same limit as manifest_io.MAX_WORKBOOKS)
+@st.cache_resource(max_entries=4, show_spinner=False)
+def load_workbook(file_id, _uploaded_file):
+    from manifest_io import open_workbook
+    return open_workbook(_uploaded_file)
+
+# Daily delivery history, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_store():
+    from manifest_store import ManifestStore
+    return ManifestStore()
+
+# Delivery counts the form starts with; extracting from Excel overwrites them
+for key, value in {"D_a": 80, "D_b": 100, "D_c": 10}.items():
+    st.session_state.setdefault(key, value)
 
 # Title
 st.title("Delivery Cost Optimization")
 
-# Manual Entry of Deliveries
-st.write("### Manual Entry of Deliveries")
-D_a = st.number_input("Number of Type A deliveries (0-2 kg)", min_value=0, value=80)
-D_b = st.number_input("Number of Type B deliveries (2-10 kg)", min_value=0, value=100)
-D_c = st.number_input("Number of Type C deliveries (10-200 kg)", min_value=0, value=10)
-
 # File uploader for Excel file
 st.subheader("Upload Excel File")
 uploaded_file = st.file_uploader("Choose an Excel file", type="xlsx")
@@ -24,27 +48,40 @@ st.write("""
 """)
 
 # Function to extract delivery data from the selected sheet
-def extract_deliveries_from_excel(file, sheet_name):
-    df = pd.read_excel(file, sheet_name=sheet_name)
-    if 'Weight (KG)' not in df.columns:
+def extract_deliveries_from_excel(workbook, sheet_name):
+    totals = workbook.delivery_totals(sheet_name)
+    if totals is None:
         st.error("The selected sheet does not contain the required 'Weight (KG)' column.")
         return None, None, None
-    
-    weight = df['Weight (KG)']
-    D_a = sum((weight > 0) & (weight <= 2))
-    D_b = sum((weight > 2) & (weight <= 10))
-    D_c = sum((weight > 10) & (weight <= 200))
-    
-    return D_a, D_b, D_c
-
-# Extract deliveries from uploaded Excel file
+
+    skipped = totals["out_of_range"] + totals["missing"]
+    if skipped:
+        st.warning(f"{skipped} rows had a missing weight or a weight outside 0-200 kg and were not counted.")
+
+    counts = totals["counts"]
+    return counts["A"], counts["B"], counts["C"]
+
+# Extract deliveries from uploaded Excel file into the delivery fields below
 if uploaded_file:
-    excel = pd.ExcelFile(uploaded_file)
-    sheet_name = st.selectbox("Select Sheet", excel.sheet_names)
+    workbook = load_workbook(uploaded_file.file_id, uploaded_file)
+    sheet_name = st.selectbox("Select Sheet", workbook.sheet_names)
+    from manifest_store import sheet_day
+
+    col_depot, col_day = st.columns(2)
+    depot = col_depot.text_input("Depot", value="Main")
+    # Sheets named by date fill in their day; any other sheet needs one picked by hand
+    day = col_day.date_input("Delivery date", value=sheet_day(sheet_name), key=f"delivery_date_{sheet_name}")
+    save_history = st.checkbox("Add to the delivery history", value=False)
     if st.button("Extract Deliveries from Excel"):
-        D_a, D_b, D_c = extract_deliveries_from_excel(uploaded_file, sheet_name)
+        with span("extract_deliveries", sheet=sheet_name):
+            D_a, D_b, D_c = extract_deliveries_from_excel(workbook, sheet_name)
         if D_a is not None:
+            st.session_state.update(D_a=D_a, D_b=D_b, D_c=D_c)
             st.success(f"Extracted Deliveries - Type A: {D_a}, Type B: {D_b}, Type C: {D_c}")
+            if save_history and day is None:
+                st.warning("Pick the delivery date of this sheet to add it to the delivery history.")
+            elif save_history and get_store().ingest(workbook, sheet_name, depot, day):
+                st.info(f"Saved to the delivery history of {depot} for {day}.")
 
 # Display vehicle descriptions
 vehicle_descriptions = {
@@ -58,143 +95,108 @@ st.text("V1: " + vehicle_descriptions["V1"])
 st.text("V2: " + vehicle_descriptions["V2"])
 st.text("V3: " + vehicle_descriptions["V3"])
 
-# User input for vehicle capacities
-st.subheader("Vehicle Capacities (deliveries per day)")
-v1_capacity = st.number_input("Capacity of V1", min_value=1, value=64)
-v2_capacity = st.number_input("Capacity of V2", min_value=1, value=66)
-v3_capacity = st.number_input("Capacity of V3", min_value=1, value=72)
-
-# User input for vehicle costs
-st.subheader("Vehicle Costs (INR per day)")
-cost_v1 = st.number_input("Cost of V1", min_value=0.0, value=2416.0)
-cost_v2 = st.number_input("Cost of V2", min_value=0.0, value=1270.0)
-cost_v3 = st.number_input("Cost of V3", min_value=0.0, value=1115.0)
-
-# User selection for scenario
-scenario = st.selectbox("Select Scenario", ["Scenario 1: V1, V2, V3", "Scenario 2: V1, V2", "Scenario 3: V1, V3"])
-
-# Functions to run optimizations
-def optimize_scenario_1(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V2 = pulp.LpVariable('V2', lowBound=0, cat='Integer')
-    V3 = pulp.LpVariable('V3', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A2 = pulp.LpVariable('A2', lowBound=0, cat='Continuous')
-    B2 = pulp.LpVariable('B2', lowBound=0, cat='Continuous')
-    A3 = pulp.LpVariable('A3', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v2 * V2 + cost_v3 * V3, "Total Cost"
-    lp_problem += A1 + A2 + A3 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 + B2 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
-    lp_problem += v1_capacity * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += v2_capacity * V2 >= B2 + A2, "V2_Capacity_Constraint"
-    lp_problem += v3_capacity * V3 >= A3, "V3_Capacity_Constraint"
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= v1_capacity * V1 - C1, "Assign_B_To_V1"
-    lp_problem += B2 == D_b - B1, "Assign_Remaining_B_To_V2"
-    lp_problem += A1 <= v1_capacity * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A2 <= v2_capacity * V2 - B2, "Assign_A_To_V2"
-    lp_problem += A3 == D_a - A1 - A2, "Assign_Remaining_A_To_V3"
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V2": pulp.value(V2),
-        "V3": pulp.value(V3),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V2": pulp.value(B2 + A2),
-        "Deliveries assigned to V3": pulp.value(A3)
-    }
-
-def optimize_scenario_2(D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity):
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V2 = pulp.LpVariable('V2', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A2 = pulp.LpVariable('A2', lowBound=0, cat='Continuous')
-    B2 = pulp.LpVariable('B2', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v2 * V2, "Total Cost"
-
-    lp_problem += A1 + A2 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 + B2 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
-
-    lp_problem += v1_capacity * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += v2_capacity * V2 >= B2 + A2, "V2_Capacity_Constraint"
-
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= v1_capacity * V1 - C1, "Assign_B_To_V1"
-    lp_problem += B2 == D_b - B1, "Assign_Remaining_B_To_V2"
-    lp_problem += A1 <= v1_capacity * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A2 == D_a - A1, "Assign_Remaining_A_To_V2"
-
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V2": pulp.value(V2),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V2": pulp.value(B2 + A2)
-    }
-
-def optimize_scenario_3(D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity):
-    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
-
-    V1 = pulp.LpVariable('V1', lowBound=0, cat='Integer')
-    V3 = pulp.LpVariable('V3', lowBound=0, cat='Integer')
-
-    A1 = pulp.LpVariable('A1', lowBound=0, cat='Continuous')
-    B1 = pulp.LpVariable('B1', lowBound=0, cat='Continuous')
-    C1 = pulp.LpVariable('C1', lowBound=0, cat='Continuous')
-    A3 = pulp.LpVariable('A3', lowBound=0, cat='Continuous')
-
-    lp_problem += cost_v1 * V1 + cost_v3 * V3, "Total Cost"
-
-    lp_problem += A1 + A3 == D_a, "Total_Deliveries_A_Constraint"
-    lp_problem += B1 == D_b, "Total_Deliveries_B_Constraint"
-    lp_problem += C1 == D_c, "Total_Deliveries_C_Constraint"
-
-    lp_problem += v1_capacity * V1 >= C1 + B1 + A1, "V1_Capacity_Constraint"
-    lp_problem += v3_capacity * V3 >= A3, "V3_Capacity_Constraint"
-
-    lp_problem += C1 == D_c, "Assign_C_To_V1"
-    lp_problem += B1 <= v1_capacity * V1 - C1, "Assign_B_To_V1"
-    lp_problem += A1 <= v1_capacity * V1 - C1 - B1, "Assign_A_To_V1"
-    lp_problem += A3 == D_a - A1, "Assign_Remaining_A_To_V3"
-
-    lp_problem.solve()
-
-    return {
-        "Status": pulp.LpStatus[lp_problem.status],
-        "V1": pulp.value(V1),
-        "V3": pulp.value(V3),
-        "Total Cost": pulp.value(lp_problem.objective),
-        "Deliveries assigned to V1": pulp.value(C1 + B1 + A1),
-        "Deliveries assigned to V3": pulp.value(A3)
-    }
-
-if st.button("Optimize"):
-    if scenario == "Scenario 1: V1, V2, V3":
-        result = optimize_scenario_1(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
-    elif scenario == "Scenario 2: V1, V2":
-        result = optimize_scenario_2(D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity)
-    elif scenario == "Scenario 3: V1, V3":
-        result = optimize_scenario_3(D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity)
-    
+# User selection for solver
+solvers = {
+    "Native (exact, in-process)": "native",
+    "PuLP (CBC)": "cbc",
+    "PuLP (HiGHS)": "highs",
+    "Cross-check (Native vs CBC)": "crosscheck",
+}
+if not highs_available():
+    del solvers["PuLP (HiGHS)"]
+
+# All optimization inputs are submitted together, so editing them does not rerun the app
+with st.form("optimize_form"):
+    # Manual Entry of Deliveries
+    st.write("### Manual Entry of Deliveries")
+    D_a = st.number_input("Number of Type A deliveries (0-2 kg)", min_value=0, key="D_a")
+    D_b = st.number_input("Number of Type B deliveries (2-10 kg)", min_value=0, key="D_b")
+    D_c = st.number_input("Number of Type C deliveries (10-200 kg)", min_value=0, key="D_c")
+
+    # User input for vehicle capacities
+    st.subheader("Vehicle Capacities (deliveries per day)")
+    v1_capacity = st.number_input("Capacity of V1", min_value=1, value=64)
+    v2_capacity = st.number_input("Capacity of V2", min_value=1, value=66)
+    v3_capacity = st.number_input("Capacity of V3", min_value=1, value=72)
+
+    # User input for vehicle costs
+    st.subheader("Vehicle Costs (INR per day)")
+    cost_v1 = st.number_input("Cost of V1", min_value=0.0, value=2416.0)
+    cost_v2 = st.number_input("Cost of V2", min_value=0.0, value=1270.0)
+    cost_v3 = st.number_input("Cost of V3", min_value=0.0, value=1115.0)
+
+    # User selection for scenario
+    scenario = st.selectbox("Select Scenario", ["Scenario 1: V1, V2, V3", "Scenario 2: V1, V2", "Scenario 3: V1, V3", "All scenarios (ranked)"])
+
+    solver = st.selectbox("Select Solver", list(solvers))
+    with st.expander("Solver settings"):
+        time_limit = st.number_input("Time limit (seconds)", min_value=1.0, value=float(DEFAULT_TIME_LIMIT or 60))
+        gap = st.number_input("Relative MIP gap", min_value=0.0, max_value=0.99, value=0.0, format="%.4f")
+        threads = st.number_input("Solver threads", min_value=1, value=1)
+
+    optimize = st.form_submit_button("Optimize")
+
+backend = solvers[solver]
+inputs = {
+    "D_a": D_a, "D_b": D_b, "D_c": D_c,
+    "cost_v1": cost_v1, "cost_v2": cost_v2, "cost_v3": cost_v3,
+    "v1_capacity": v1_capacity, "v2_capacity": v2_capacity, "v3_capacity": v3_capacity,
+}
+solver_options = {"backend": backend, "time_limit": time_limit, "gap": gap or None, "threads": threads}
+
+# Solves run as background jobs, except cached ones and native ones small enough to finish
+# at once (native_is_quick), which run right away. Results are kept in the session so they
+# stay on the page through later reruns. While a job runs the greedy fleet is shown, and
+# replaced by the exact result when it finishes.
+if optimize:
+    if scenario == "All scenarios (ranked)":
+        provisional = sorted((dict(greedy_scenario(name, inputs), Scenario=name) for name in SCENARIOS), key=lambda r: r["Total Cost"])
+    else:
+        provisional = greedy_scenario(scenario, inputs)
+    st.session_state["optimize_provisional"] = {"scenario": scenario, "result": provisional}
+
+    if scenario == "All scenarios (ranked)":
+        args = (D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+        start_job(
+            "optimize_job", solve_all_scenarios, *args,
+            name="All scenarios", context={"scenario": scenario, "inputs": inputs},
+            inline=(backend == "native" and all(native_is_quick(name, inputs) for name in SCENARIOS))
+            or scenarios_cached(*args, **solver_options),
+            **solver_options,
+        )
+    else:
+        if scenario == "Scenario 1: V1, V2, V3":
+            func, args = optimize_scenario_1, (D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+        elif scenario == "Scenario 2: V1, V2":
+            func, args = optimize_scenario_2, (D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity)
+        elif scenario == "Scenario 3: V1, V3":
+            func, args = optimize_scenario_3, (D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity)
+        start_job(
+            "optimize_job", func, *args, name=scenario, context={"scenario": scenario, "inputs": inputs},
+            inline=backend == "native" and native_is_quick(scenario, inputs), **solver_options,
+        )
+
+job_status("optimize_job", "optimize_results")
+results = st.session_state.get("optimize_results")
+provisional = st.session_state.get("optimize_provisional")
+if "optimize_job" in st.session_state and provisional:
+    import pandas as pd
+
+    # The exact solve is still running (or failed); older results are hidden meanwhile
+    results = None
+    st.write("Provisional Results (greedy fleet, exact solve pending):")
+    ranked = provisional["result"] if isinstance(provisional["result"], list) else [dict(provisional["result"], Scenario=provisional["scenario"])]
+    table = pd.DataFrame(ranked).set_index("Scenario").drop(columns="Status")
+    table["Gap"] = table["Gap"].map("{:.2%}".format)
+    st.table(table)
+    st.caption("Lower Bound is the LP relaxation cost; the optimal fleet costs between it and the greedy Total Cost.")
+if results and results["scenario"] == "All scenarios (ranked)":
+    import pandas as pd
+
+    st.write("Optimization Results (cheapest first):")
+    st.table(pd.DataFrame(results["result"]).set_index("Scenario"))
+elif results:
+    result = results["result"]
     st.write("Optimization Results:")
     st.write(f"Status: {result['Status']}")
     st.write(f"V1: {result['V1']}")
@@ -208,3 +210,152 @@ if st.button("Optimize"):
         st.write(f"Deliveries assigned to V2: {result['Deliveries assigned to V2']}")
     if "Deliveries assigned to V3" in result:
         st.write(f"Deliveries assigned to V3: {result['Deliveries assigned to V3']}")
+    st.write(f"Solve time: {result['Solve Time (s)']:.3f} s, MIP gap: {result['MIP Gap'] if result['MIP Gap'] is not None else 'n/a'}")
+    if "Cross-check" in result:
+        st.write(f"Cross-check: {result['Cross-check']}")
+
+    # Shadow prices, ranges and breakpoints of the solved inputs; what-if questions are
+    # answered from them and only re-solved outside the stored ranges
+    with st.expander("Sensitivity and what-if"):
+        from sensitivity import sensitivity_analysis, what_if
+
+        report = sensitivity_analysis(results["scenario"], results["inputs"])
+        st.write("Cost of one more delivery (LP shadow price, INR):")
+        st.table({c: [round(p, 2)] for c, p in report["Shadow prices"].items()})
+        st.write("Vehicle costs over which this fleet stays optimal (INR per day):")
+        st.table({v: [f"{lo:g} to {hi:g}"] for v, (lo, hi) in report["Cost ranges"].items()})
+        st.write("Deliveries over which this fleet stays optimal (other types unchanged):")
+        st.table({
+            f"Type {c}": [f"{lo if lo is not None else '?'} to {hi if hi is not None else '?'}", ", ".join(map(str, report["Breakpoints"][c][:8]))]
+            for c, (lo, hi) in report["Demand ranges"].items()
+        })
+        st.caption("Second row: demands within the table at which the optimal fleet changes.")
+
+        with st.form("what_if_form"):
+            what_if_param = st.selectbox("Change", PARAMETERS)
+            what_if_delta = st.number_input("By", value=10.0)
+            ask = st.form_submit_button("What if?")
+        if ask:
+            delta = int(what_if_delta) if what_if_param in INTEGER_PARAMETERS else what_if_delta
+            try:
+                answer = what_if(report, {what_if_param: delta})
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                fleet = ", ".join(f"{v}: {answer[v]:g}" for v in ["V1", "V2", "V3"] if v in answer)
+                st.write(f"{answer['Status']} - {fleet}, Total Cost: {answer['Total Cost']:g} ({answer['Answered from']})")
+
+# Sensitivity sweep over two inputs
+st.subheader("Sensitivity Sweep")
+with st.expander("Sweep two inputs over a grid"):
+    sweep_scenario = scenario if scenario != "All scenarios (ranked)" else "Scenario 1: V1, V2, V3"
+    st.write(f"Scenario: {sweep_scenario}")
+
+    with st.form("sweep_form"):
+        col_x, col_y = st.columns(2)
+        with col_x:
+            x_param = st.selectbox("X axis input", PARAMETERS, index=PARAMETERS.index("cost_v2"))
+            x_min = st.number_input("X from", value=None, placeholder="80% of the current value")
+            x_max = st.number_input("X to", value=None, placeholder="120% of the current value")
+            x_steps = st.number_input("X steps", min_value=2, max_value=200, value=25)
+        with col_y:
+            y_param = st.selectbox("Y axis input", PARAMETERS, index=PARAMETERS.index("v3_capacity"))
+            y_min = st.number_input("Y from", value=None, placeholder="80% of the current value")
+            y_max = st.number_input("Y to", value=None, placeholder="120% of the current value")
+            y_steps = st.number_input("Y steps", min_value=2, max_value=200, value=25)
+        run_sweep = st.form_submit_button("Run Sweep")
+
+    if run_sweep:
+        if x_param == y_param:
+            st.error("Choose two different inputs to sweep.")
+        else:
+            import numpy as np
+            from sweep import sweep
+
+            ranges = {
+                x_param: np.linspace(
+                    x_min if x_min is not None else float(inputs[x_param]) * 0.8,
+                    x_max if x_max is not None else float(inputs[x_param]) * 1.2,
+                    int(x_steps),
+                ),
+                y_param: np.linspace(
+                    y_min if y_min is not None else float(inputs[y_param]) * 0.8,
+                    y_max if y_max is not None else float(inputs[y_param]) * 1.2,
+                    int(y_steps),
+                ),
+            }
+            # Counts and capacities are whole numbers; capacities must stay positive
+            for p in ranges:
+                if p.startswith("D_"):
+                    ranges[p] = np.unique(np.clip(np.round(ranges[p]), 0, None).astype(int))
+                elif p.endswith("_capacity"):
+                    ranges[p] = np.unique(np.clip(np.round(ranges[p]), 1, None).astype(int))
+            start_job(
+                "sweep_job", sweep, sweep_scenario, inputs, ranges, backend=backend,
+                name="Sweep", context={"x": x_param, "y": y_param},
+            )
+
+    job_status("sweep_job", "sweep_results")
+    if "sweep_results" in st.session_state:
+        import altair as alt
+
+        sweep_results = st.session_state["sweep_results"]["result"]
+        sweep_x, sweep_y = st.session_state["sweep_results"]["x"], st.session_state["sweep_results"]["y"]
+        for metric in ["Total Cost", "V1", "V2", "V3"]:
+            if metric not in sweep_results:
+                continue
+            chart = alt.Chart(sweep_results).mark_rect().encode(
+                x=alt.X(f"{sweep_x}:O", axis=alt.Axis(format=".4~f")),
+                y=alt.Y(f"{sweep_y}:O", sort="descending", axis=alt.Axis(format=".4~f")),
+                color=alt.Color(f"{metric}:Q"),
+                tooltip=[sweep_x, sweep_y, "Total Cost", "V1"] + [v for v in ["V2", "V3"] if v in sweep_results],
+            ).properties(title=metric)
+            st.altair_chart(chart)
+
+# Fleet sizing for uncertain demand by Monte Carlo simulation
+st.subheader("Demand Uncertainty")
+with st.expander("Size the fleet for varying daily demand"):
+    sim_scenario = scenario if scenario != "All scenarios (ranked)" else "Scenario 1: V1, V2, V3"
+    st.write(f"Scenario: {sim_scenario}")
+
+    with st.form("simulation_form"):
+        sources = ["Entered counts"] + (["Uploaded workbook (one sheet per day)"] if uploaded_file else []) + ["Delivery history"]
+        demand_source = st.radio("Fit daily demand to", sources, horizontal=True)
+        history_days = st.number_input("Days of history", min_value=2, value=90)
+        st.write("For the entered counts, daily deliveries vary around them by:")
+        variation = st.number_input("Day-to-day variation (standard deviation, % of the mean)", min_value=0.0, value=25.0)
+        samples = st.number_input("Simulated days", min_value=100, max_value=200_000, value=10_000, step=1000)
+        service_level = st.number_input("Service level (share of days every delivery is carried)", min_value=0.01, max_value=1.0, value=0.95)
+        simulate = st.form_submit_button("Simulate")
+
+    if simulate:
+        from demand_simulation import demand_distribution, fit_distribution, simulate_fleet
+
+        if demand_source == "Entered counts":
+            mean = [D_a, D_b, D_c]
+            distribution = demand_distribution(mean, [m * variation / 100 for m in mean])
+        else:
+            if demand_source == "Delivery history":
+                history = get_store().demand_history(depot if uploaded_file else None, int(history_days))
+            else:
+                history = [workbook.delivery_totals(sheet) for sheet in workbook.sheet_names]
+                history = [[t["counts"][c] for c in "ABC"] for t in history if t is not None]
+            distribution = fit_distribution(history) if len(history) > 1 else None
+        if distribution is None:
+            st.error("Fitting needs at least two days of deliveries.")
+        else:
+            st.session_state["simulation_results"] = simulate_fleet(sim_scenario, inputs, distribution, int(samples), service_level)
+
+    if "simulation_results" in st.session_state:
+        sim_result, sim_table = st.session_state["simulation_results"]
+        fleet = ", ".join(f"{v}: {sim_result[v]:g}" for v in ["V1", "V2", "V3"] if v in sim_result)
+        st.write(f"Fleet with the lowest expected cost: {fleet}")
+        st.write(
+            f"Fleet cost: {sim_result['Fleet Cost']:.0f}, expected overflow cost: {sim_result['Expected Overflow Cost']:.0f}, "
+            f"expected total: {sim_result['Expected Cost']:.0f} INR per day"
+        )
+        st.write(f"Every delivery carried on {sim_result['Service Level']:.1%} of days; {sim_result['Delivery Coverage']:.2%} of deliveries carried")
+        st.dataframe(sim_table.head(20))
+
+# Timing spans of this run
+performance_panel(perf_run)
@@ -0,0 +1,288 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import openpyxl
+import pulp
+
+from fleet_model import FleetModel
+from fleet_optimizer import SCENARIOS, VEHICLE_TYPES, load_optimization, native_fleet, vehicle_table
+from manifest_io import WEIGHT_COLUMN, ParsedWorkbook, open_workbook, stream_delivery_totals
+from parcel_packing import LOAD_VEHICLES, load_parcels, pack_parcels
+from plan_fleet import DEFAULT_CONFIG
+from solver_config import solver_settings
+from weight_classes import OPEN_ENDED_EDGES, classify_weights
+
+# Manifest sizes (rows) benchmarked by default
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+# Generated manifests are kept here so reruns time the code, not the generator
+BENCHMARK_DATA_DIR = os.environ.get(
+    "BENCHMARK_DATA_DIR", os.path.join(os.path.expanduser("~"), ".cache", "load_optimization", "benchmarks")
+)
+
+# Share of parcels in each weight band and the kg range drawn from (log-uniform within a
+# band, so light parcels dominate each band as in real manifests)
+WEIGHT_BANDS = {"A": (0.45, 0.05, 2.0), "B": (0.40, 2.0, 10.0), "C": (0.15, 10.0, 200.0)}
+
+# Share of rows with no weight filled in
+MISSING_SHARE = 0.01
+
+# Parcels packed by default, and the gamma distribution (shape, scale in kg) of their
+# weights when packed into one vehicle type
+DEFAULT_PARCELS = 100_000
+PACKING_GAMMA = (2.0, 15.0)
+
+# Each benchmark repeats until it has this many samples or has run for the time budget
+MAX_REPEATS = 5
+TIME_BUDGET = 10.0
+
+# Calls faster than this are timed in batches (like timeit) so timer noise does not swamp them
+MIN_SAMPLE_TIME = 0.02
+
+
+def synthetic_weights(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    shares = np.array([band[0] for band in WEIGHT_BANDS.values()])
+    band = rng.choice(len(WEIGHT_BANDS), size=rows, p=shares / shares.sum())
+    low = np.array([b[1] for b in WEIGHT_BANDS.values()])[band]
+    high = np.array([b[2] for b in WEIGHT_BANDS.values()])[band]
+    weights = np.round(np.exp(rng.uniform(np.log(low), np.log(high))), 2)
+    weights[rng.random(rows) < MISSING_SHARE] = np.nan
+    return weights
+
+
+# Random (D_a, D_b, D_c) triples between a small and a large depot's daily volume
+def synthetic_demands(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [tuple(int(d) for d in row) for row in rng.integers(0, [400, 600, 150], size=(count, 3))]
+
+
+# Write a manifest with the weight column among other typical columns; reused if it exists
+def synthetic_manifest(rows, seed=0, data_dir=BENCHMARK_DATA_DIR):
+    path = os.path.join(data_dir, f"manifest_{rows}_{seed}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    weights = synthetic_weights(rows, seed)
+    book = openpyxl.Workbook(write_only=True)
+    sheet = book.create_sheet("Deliveries")
+    sheet.append(["Order ID", "Customer", WEIGHT_COLUMN, "Postcode"])
+    for i, w in enumerate(weights):
+        sheet.append([f"ORD{i:08d}", f"Customer {i % 977}", None if np.isnan(w) else float(w), f"{1000 + i % 8999}"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    book.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Seconds per call of func(), one sample per batch, until there are `repeats` samples or
+# the time budget is used up
+def measure(func, repeats=MAX_REPEATS, budget=TIME_BUDGET):
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    number = max(1, int(MIN_SAMPLE_TIME / max(first, 1e-9)))
+
+    samples = [] if number > 1 else [first]
+    started = time.perf_counter()
+    while len(samples) < repeats and (not samples or time.perf_counter() - started < budget):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def _record(results, name, samples, **params):
+    row = {
+        "name": name,
+        "params": params,
+        "samples": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "max_s": max(samples),
+    }
+    results.append(row)
+    print(f"{name:<40} {json.dumps(params):<32} median {row['median_s'] * 1000:10.2f} ms  ({len(samples)} runs)", file=sys.stderr)
+
+
+def bench_ingestion(results, rows, seed, data_dir):
+    path = synthetic_manifest(rows, seed, data_dir)
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = str(rows)
+
+    # extract_deliveries_from_excel on a fresh upload: full parse, no disk cache
+    _record(results, "extract_deliveries.cold", measure(
+        lambda: ParsedWorkbook(data, digest, cache_dir=None).delivery_totals("Deliveries")
+    ), rows=rows)
+
+    # Same manifest uploaded again after a restart: memory-mapped weights from disk
+    with tempfile.TemporaryDirectory() as cache_dir:
+        ParsedWorkbook(data, digest, cache_dir=cache_dir).delivery_totals("Deliveries")
+        _record(results, "extract_deliveries.disk_cache", measure(
+            lambda: ParsedWorkbook(data, digest, cache_dir=cache_dir).delivery_totals("Deliveries")
+        ), rows=rows)
+
+    # Rerun within the session: hash lookup and cached totals
+    open_workbook(data).delivery_totals("Deliveries")
+    _record(results, "extract_deliveries.rerun", measure(
+        lambda: open_workbook(data).delivery_totals("Deliveries")
+    ), rows=rows)
+
+    _record(results, "stream_delivery_totals", measure(
+        lambda: stream_delivery_totals(path, "Deliveries")
+    ), rows=rows)
+
+    # app5.py's classification of the weight column, Type C open ended
+    weights = synthetic_weights(rows, seed)
+    _record(results, "classify_weights", measure(
+        lambda: classify_weights(weights, edges=OPEN_ENDED_EDGES)
+    ), rows=rows)
+
+
+def bench_packing(results, parcels, seed):
+    rng = np.random.default_rng(seed)
+    weights = rng.gamma(*PACKING_GAMMA, size=parcels)
+    capacity, weight_capacity = LOAD_VEHICLES[0]["capacity"], LOAD_VEHICLES[0]["weight_capacity"]
+    _record(results, "pack_parcels", measure(
+        lambda: pack_parcels(weights, capacity, weight_capacity)
+    ), parcels=parcels, capacity=capacity, weight_capacity=weight_capacity)
+
+    # app5.py's parcel-level loading: classification and packing per vehicle type
+    weights = synthetic_weights(parcels, seed)
+    _record(results, "load_parcels", measure(lambda: load_parcels(weights)), parcels=parcels)
+
+
+def bench_optimization(results, demands, backend):
+    settings = solver_settings(backend)
+    costs = {v: DEFAULT_CONFIG[f"cost_v{v[1:]}"] for v in VEHICLE_TYPES}
+    capacities = {v: DEFAULT_CONFIG[f"v{v[1:]}_capacity"] for v in VEHICLE_TYPES}
+
+    for name, (_, inputs) in SCENARIOS.items():
+        used = [v for v in VEHICLE_TYPES if f"cost_{v.lower()}" in inputs]
+        vehicles = vehicle_table(costs, {v: capacities[v] for v in used})
+        label = name.split(":")[0].lower().replace(" ", "_")
+
+        _record(results, f"{label}.build", measure(lambda: FleetModel(vehicles, "ABC")), backend=backend)
+
+        model = FleetModel(vehicles, "ABC")
+        samples = []
+        for D_a, D_b, D_c in demands:
+            samples += measure(lambda: model.solve({"A": D_a, "B": D_b, "C": D_c}, settings=settings), repeats=1)
+        _record(results, f"{label}.solve", samples, backend=backend, demands=len(demands))
+
+        native_args = [capacities.get(v) if v in used else None for v in VEHICLE_TYPES]
+        native_costs = [costs[v] if v in used else None for v in VEHICLE_TYPES]
+        samples = []
+        for D_a, D_b, D_c in demands:
+            samples += measure(lambda: native_fleet(D_a, D_b, D_c, *native_costs, *native_args), repeats=1)
+        _record(results, f"{label}.native", samples, demands=len(demands))
+
+    # load_optimization builds its model on every call, so it is timed as a whole
+    samples = []
+    for D_a, D_b, D_c in demands:
+        W_a, W_b, W_c = D_a * 1.5, D_b * 6, D_c * 15
+        samples += measure(lambda: load_optimization.__wrapped__(
+            D_a, D_b, D_c, W_a, W_b, W_c, 1000, 1000, 1000, backend=backend
+        ), repeats=1)
+    _record(results, "load_optimization.build_and_solve", samples, backend=backend, demands=len(demands))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args):
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "openpyxl": openpyxl.__version__,
+        "pulp": pulp.__version__,
+        "sizes": list(args.sizes),
+        "parcels": args.parcels,
+        "demands": args.demands,
+        "seed": args.seed,
+        "backend": args.backend,
+    }
+
+
+# Print each benchmark's change against an earlier results file; returns the names of
+# benchmarks whose median slowed down by more than the tolerance
+def compare(previous, current, tolerance):
+    key = lambda r: (r["name"], json.dumps(r["params"], sort_keys=True))
+    before = {key(r): r for r in previous["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = before.get(key(row))
+        if old is None:
+            continue
+        ratio = row["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(row["name"])
+        print(f"{row['name']:<40} {json.dumps(row['params']):<32} {old['median_s'] * 1000:10.2f} -> {row['median_s'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark manifest ingestion and the fleet optimizers.")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write (default: benchmark_results.json)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="manifest sizes in rows")
+    parser.add_argument("--parcels", type=int, default=DEFAULT_PARCELS, help=f"parcels per packing benchmark (default: {DEFAULT_PARCELS})")
+    parser.add_argument("--demands", type=int, default=20, help="synthetic demand triples per optimization benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["cbc", "highs"], default="cbc", help="MILP solver to time")
+    parser.add_argument("--data-dir", default=BENCHMARK_DATA_DIR, help="where generated manifests are kept")
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--skip-packing", action="store_true")
+    parser.add_argument("--skip-optimization", action="store_true")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown counted as a regression (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = []
+    if not args.skip_ingestion:
+        for rows in args.sizes:
+            bench_ingestion(results, rows, args.seed, args.data_dir)
+    if not args.skip_packing:
+        bench_packing(results, args.parcels, args.seed)
+    if not args.skip_optimization:
+        bench_optimization(results, synthetic_demands(args.demands, args.seed), args.backend)
+
+    report = {"metadata": metadata(args), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} benchmarks to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(previous, report, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
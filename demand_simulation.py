@@ -0,0 +1,227 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+
+from fleet_optimizer import VEHICLE_TYPES
+from perf_trace import configure as configure_tracing, span, trace_run
+from sensitivity import scenario_vehicles, shadow_prices
+
+# Simulated days per run
+DEFAULT_SAMPLES = 10_000
+
+# Share of simulated days on which the fleet must carry every delivery
+DEFAULT_SERVICE_LEVEL = 0.95
+
+# Deliveries the fleet cannot carry are costed at this multiple of their LP shadow price
+# (what the fleet itself pays per delivery) unless overflow rates are given
+OVERFLOW_MARKUP = 2.0
+
+# Samples x candidate fleets evaluated at once, to bound memory (about 8 bytes each per array)
+MAX_BLOCK_CELLS = 4_000_000
+
+
+# Demand distribution from the mean and standard deviation of each type's daily deliveries
+# (in A, B, C order) and an optional 3x3 correlation matrix
+def demand_distribution(mean, std, correlation=None):
+    mean = np.asarray(mean, dtype=np.float64)
+    std = np.asarray(std, dtype=np.float64)
+    if mean.shape != (3,) or std.shape != (3,):
+        raise ValueError("mean and std need one value per delivery type (A, B, C)")
+    if (mean < 0).any() or (std < 0).any():
+        raise ValueError("mean and std must not be negative")
+    correlation = np.eye(3) if correlation is None else np.asarray(correlation, dtype=np.float64)
+    if correlation.shape != (3, 3) or not np.allclose(np.diag(correlation), 1):
+        raise ValueError("correlation must be a 3x3 matrix with ones on the diagonal")
+    return {"mean": mean, "std": std, "correlation": correlation}
+
+
+# Distribution fitted to historical daily demands, one (D_a, D_b, D_c) row per day
+def fit_distribution(history):
+    history = np.asarray(history, dtype=np.float64).reshape(-1, 3)
+    if len(history) < 2:
+        raise ValueError("Fitting a distribution needs at least two days of history")
+    std = history.std(axis=0, ddof=1)
+    correlation = np.eye(3)
+    varying = std > 0
+    if varying.sum() > 1:
+        correlation[np.ix_(varying, varying)] = np.corrcoef(history[:, varying], rowvar=False)
+    return demand_distribution(history.mean(axis=0), std, correlation)
+
+
+# Daily demands as a (samples, 3) integer array. Each type is log-normal with the given
+# mean and standard deviation (counts are positive and skewed to busy days); types are
+# correlated through a Gaussian copula.
+def sample_demands(distribution, samples=DEFAULT_SAMPLES, seed=0):
+    rng = np.random.default_rng(seed)
+    mean, std = distribution["mean"], distribution["std"]
+    z = rng.multivariate_normal(np.zeros(3), distribution["correlation"], size=samples, method="eigh")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(np.log1p(np.where(mean > 0, (std / mean) ** 2, 0)))
+        mu = np.log(np.where(mean > 0, mean, 1)) - sigma ** 2 / 2
+    demands = np.where(mean > 0, np.exp(mu + sigma * z), 0)
+    return np.rint(demands).astype(np.int64)
+
+
+# Fleets worth evaluating, one row of (V1, V2, V3) counts each. A fleet needs enough
+# capacity for C, for B and C, and for all deliveries on at least the service level's
+# share of days, so smaller fleets are skipped. A fleet that would still carry every
+# simulated day with one vehicle fewer cannot be the cheapest, so those are skipped too.
+def candidate_fleets(demands, params, vehicles, service_level):
+    A, B, C = demands.T
+    cap = {v: params[f"{v.lower()}_capacity"] for v in vehicles}
+    need_c, need_bc, need_all = (np.quantile(d, service_level) for d in (C, B + C, A + B + C))
+    max_c, max_bc, max_all = C.max(), (B + C).max(), (A + B + C).max()
+
+    counts = [np.arange(math.ceil(need_c / cap["V1"]), math.ceil(max_all / cap["V1"]) + 1)]
+    counts.append(np.arange(math.ceil((A + B).max() / cap["V2"]) + 1) if "V2" in vehicles else np.zeros(1, dtype=np.int64))
+    counts.append(np.arange(math.ceil(A.max() / cap["V3"]) + 1) if "V3" in vehicles else np.zeros(1, dtype=np.int64))
+    fleets = np.stack([a.ravel() for a in np.meshgrid(*counts, indexing="ij")], axis=1)
+
+    cap1, cap12, cap_all = _capacities(fleets, params, vehicles)
+    keep = (cap12 >= need_bc) & (cap_all >= need_all)
+    c1, c2, c3 = (cap.get(v, 0) for v in VEHICLE_TYPES)
+    keep &= ~((fleets[:, 2] > 0) & (cap_all - c3 >= max_all))
+    keep &= ~((fleets[:, 1] > 0) & (cap12 - c2 >= max_bc) & (cap_all - c2 >= max_all))
+    keep &= ~((fleets[:, 0] > 0) & (cap1 - c1 >= max_c) & (cap12 - c1 >= max_bc) & (cap_all - c1 >= max_all))
+    return fleets[keep]
+
+
+def _capacities(fleets, params, vehicles):
+    caps = np.array([params[f"{v.lower()}_capacity"] if v in vehicles else 0 for v in VEHICLE_TYPES])
+    load = fleets * caps
+    return load[:, 0], load[:, 0] + load[:, 1], load.sum(axis=1)
+
+
+# Fleet cost, expected overflow cost, expected total cost, service level (share of days
+# with every delivery carried) and coverage (share of deliveries carried) of each fleet
+# across all samples. Loading the most restricted types first (C on V1, then B on V1 and
+# V2, then A anywhere) carries the most deliveries of C, of B and C, and overall at once,
+# so it is the cheapest overflow whenever heavier types cost no less to send elsewhere.
+def evaluate_fleets(demands, fleets, params, vehicles, overflow_rates):
+    A, B, C = (d[:, None] for d in demands.T)
+    costs = np.array([params[f"cost_{v.lower()}"] if v in vehicles else 0.0 for v in VEHICLE_TYPES])
+    rates = np.array([overflow_rates[t] for t in "ABC"], dtype=np.float64)
+    total = demands.sum()
+
+    overflow_cost = np.empty(len(fleets))
+    service = np.empty(len(fleets))
+    carried = np.empty(len(fleets))
+    block = max(1, MAX_BLOCK_CELLS // max(1, len(demands)))
+    for start in range(0, len(fleets), block):
+        cap1, cap12, cap_all = (c[None, :] for c in _capacities(fleets[start:start + block], params, vehicles))
+        served_c = np.minimum(C, cap1)
+        served_b = np.minimum(B, cap12 - served_c)
+        served_a = np.minimum(A, cap_all - served_c - served_b)
+        left_a, left_b, left_c = A - served_a, B - served_b, C - served_c
+
+        cells = slice(start, start + block)
+        overflow_cost[cells] = (rates[0] * left_a + rates[1] * left_b + rates[2] * left_c).mean(axis=0)
+        service[cells] = ((left_a + left_b + left_c) == 0).mean(axis=0)
+        carried[cells] = (served_a + served_b + served_c).sum(axis=0)
+
+    fleet_cost = fleets @ costs
+    return {
+        "Fleet Cost": fleet_cost,
+        "Expected Overflow Cost": overflow_cost,
+        "Expected Cost": fleet_cost + overflow_cost,
+        "Service Level": service,
+        "Delivery Coverage": carried / total if total else np.ones(len(fleets)),
+    }
+
+
+# Fleet with the lowest expected cost among those carrying every delivery on at least
+# service_level of the simulated days. params holds the vehicle costs and capacities;
+# overflow_rates the cost per uncarried delivery of each type. Returns the chosen fleet's
+# result and a table of the qualifying fleets evaluated, cheapest first.
+def simulate_fleet(scenario, params, distribution, samples=DEFAULT_SAMPLES, service_level=DEFAULT_SERVICE_LEVEL,
+                   overflow_rates=None, seed=0):
+    import pandas as pd
+
+    if not 0 < service_level <= 1:
+        raise ValueError("service_level must be a fraction above 0 and at most 1")
+    if samples < 1:
+        raise ValueError("samples must be at least 1")
+    vehicles = scenario_vehicles(scenario)
+    if overflow_rates is None:
+        overflow_rates = {t: OVERFLOW_MARKUP * p for t, p in shadow_prices(params, vehicles).items()}
+
+    with span("sample_demands", samples=samples):
+        demands = sample_demands(distribution, samples, seed)
+    with span("evaluate_fleets") as s:
+        fleets = candidate_fleets(demands, params, vehicles, service_level)
+        costs = np.array([params[f"cost_{v.lower()}"] if v in vehicles else 0.0 for v in VEHICLE_TYPES])
+        fleets = fleets[np.argsort(fleets @ costs, kind="stable")]
+
+        # Cheapest fleets first, in blocks; a fleet's expected cost is at least its fleet
+        # cost, so once that passes the best expected cost found no later fleet can win
+        block = max(1, MAX_BLOCK_CELLS // max(1, samples))
+        evaluated, parts, best = 0, [], np.inf
+        for start in range(0, len(fleets), block):
+            chunk = fleets[start:start + block]
+            if chunk[0] @ costs > best:
+                break
+            metrics = evaluate_fleets(demands, chunk, params, vehicles, overflow_rates)
+            qualifies = metrics["Service Level"] >= service_level
+            if qualifies.any():
+                best = min(best, metrics["Expected Cost"][qualifies].min())
+            parts.append((chunk, metrics))
+            evaluated += len(chunk)
+        s.set(fleets=len(fleets), evaluated=evaluated)
+
+    fleets = np.concatenate([chunk for chunk, _ in parts])
+    table = pd.DataFrame({v: fleets[:, i] for i, v in enumerate(VEHICLE_TYPES) if v in vehicles})
+    for name in metrics:
+        table[name] = np.concatenate([m[name] for _, m in parts])
+    table = table[table["Service Level"] >= service_level].sort_values(["Expected Cost", "Fleet Cost"]).reset_index(drop=True)
+
+    best = table.iloc[0]
+    result = {"Status": "Optimal"}
+    for v in vehicles:
+        result[v] = float(best[v])
+    for name in metrics:
+        result[name] = float(best[name])
+    result["Fleets Evaluated"] = evaluated
+    return result, table
+
+
+def main(argv=None):
+    from horizon_planner import read_demands
+    from fleet_optimizer import SCENARIOS
+    from plan_fleet import find_manifests, load_config
+
+    parser = argparse.ArgumentParser(description="Size a fleet for uncertain daily demand by Monte Carlo simulation.")
+    parser.add_argument("manifest_dir", help="directory of .xlsx manifests, one sheet per day, to fit the demand distribution to")
+    parser.add_argument("--config", help="JSON file with vehicle costs and capacities")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default=next(iter(SCENARIOS)))
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="simulated days")
+    parser.add_argument("--service-level", type=float, default=DEFAULT_SERVICE_LEVEL,
+                        help="share of days every delivery must be carried on (default: 0.95)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="CSV file for the qualifying fleets, cheapest first")
+    parser.add_argument("--trace", help="append per-stage timing spans to this JSON lines file")
+    args = parser.parse_args(argv)
+    if args.trace:
+        configure_tracing(path=args.trace)
+
+    config = load_config(args.config)
+    paths = find_manifests(args.manifest_dir)
+    history = [d for path in paths for d in read_demands(path).values()]
+    history = [d for d in history if d is not None]
+    if len(history) < 2:
+        parser.error(f"need at least two sheets with a 'Weight (KG)' column in {args.manifest_dir}")
+
+    with trace_run("demand_simulation"):
+        distribution = fit_distribution(history)
+        result, table = simulate_fleet(args.scenario, config, distribution, args.samples, args.service_level, seed=args.seed)
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(f"fitted to {len(history)} days; mean {np.round(distribution['mean'], 1).tolist()}, "
+          f"std {np.round(distribution['std'], 1).tolist()}", file=sys.stderr)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
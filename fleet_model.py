@@ -0,0 +1,196 @@
+import re
+import threading
+
+import pulp
+
+from perf_trace import span
+from solver_config import solve_problem
+
+
+def _var_name(text):
+    return re.sub(r"\W", "_", str(text))
+
+
+# Older PuLP versions keep the coefficients on the constraint itself
+def _expr(constraint):
+    return getattr(constraint, "expr", constraint)
+
+
+# Fleet-sizing MILP for any table of vehicle types and delivery categories.
+#
+# Each vehicle is a dict with "name", "cost", "capacity" (deliveries per day),
+# "categories" it can carry and optionally "weight_capacity" (kg per day) and
+# "max_available". The model has one integer count per vehicle type and one continuous
+# assignment per allowed (vehicle, category) pair. The constraint rows are assembled from
+# sparse (variable, coefficient) lists, so build time grows linearly with the number of
+# allowed pairs. The model is built once; solve() only updates right-hand sides,
+# coefficients and bounds, and the variables keep their last values as a warm start.
+class FleetModel:
+    def __init__(self, vehicles, categories, name="Delivery_Cost_Minimization"):
+        with span("build_model", vehicles=len(vehicles), categories=len(categories)):
+            self._build(vehicles, categories, name)
+
+    def _build(self, vehicles, categories, name):
+        self.vehicles = [dict(v) for v in vehicles]
+        self.categories = list(categories)
+        self.names = [v["name"] for v in self.vehicles]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Vehicle names must be unique")
+        # PuLP names replace non-word characters, so distinct names can still collide
+        if len({_var_name(n) for n in self.names}) != len(self.names) or len({_var_name(c) for c in self.categories}) != len(self.categories):
+            raise ValueError("Vehicle and category names must stay unique with non-word characters replaced by '_'")
+        self.lock = threading.Lock()
+
+        self.problem = pulp.LpProblem(name, pulp.LpMinimize)
+        self.fleet = [
+            pulp.LpVariable(_var_name(v["name"]), lowBound=0, upBound=v.get("max_available"), cat='Integer')
+            for v in self.vehicles
+        ]
+
+        # Allowed (vehicle, category) pairs are the columns of the sparse constraint matrix
+        self.pairs = [
+            (i, j) for i, v in enumerate(self.vehicles)
+            for j, c in enumerate(self.categories) if c in v["categories"]
+        ]
+        self.assigned = [
+            pulp.LpVariable(f"x_{_var_name(self.categories[j])}_{_var_name(self.names[i])}", lowBound=0, cat='Continuous')
+            for i, j in self.pairs
+        ]
+
+        demand_rows = [[] for _ in self.categories]
+        capacity_rows = [[(f, v["capacity"])] for f, v in zip(self.fleet, self.vehicles)]
+        self.weighted = any(v.get("weight_capacity") is not None for v in self.vehicles)
+        weight_rows = [[(f, v.get("weight_capacity") or 0)] for f, v in zip(self.fleet, self.vehicles)]
+        for x, (i, j) in zip(self.assigned, self.pairs):
+            demand_rows[j].append((x, 1))
+            capacity_rows[i].append((x, -1))
+            weight_rows[i].append((x, 0))
+
+        self.problem += pulp.LpAffineExpression([(f, v["cost"]) for f, v in zip(self.fleet, self.vehicles)]), "Total Cost"
+        # Categories no vehicle can carry get no row; solve() reports them as infeasible
+        self.covered = [bool(row) for row in demand_rows]
+        for j, row in enumerate(demand_rows):
+            if row:
+                self.problem += pulp.LpConstraint(pulp.LpAffineExpression(row), pulp.LpConstraintEQ, self._demand_name(j), 0)
+        for i, row in enumerate(capacity_rows):
+            self.problem += pulp.LpConstraint(pulp.LpAffineExpression(row), pulp.LpConstraintGE, self._capacity_name(i), 0)
+        if self.weighted:
+            for i, row in enumerate(weight_rows):
+                if self.vehicles[i].get("weight_capacity") is not None:
+                    self.problem += pulp.LpConstraint(pulp.LpAffineExpression(row), pulp.LpConstraintGE, self._weight_name(i), 0)
+
+    def _demand_name(self, j):
+        return f"Total_Deliveries_{_var_name(self.categories[j])}_Constraint"
+
+    def _capacity_name(self, i):
+        return f"{_var_name(self.names[i])}_Capacity_Constraint"
+
+    def _weight_name(self, i):
+        return f"{_var_name(self.names[i])}_Weight_Constraint"
+
+    # Solve for a demand vector (deliveries per category). category_weights gives the total
+    # kg per category and is needed when any vehicle has a weight capacity. costs,
+    # capacities, weight_capacities and max_available override the vehicle table by name.
+    # settings come from solver_config.solver_settings (CBC with the default time limit
+    # when left out); the result carries its solve time and achieved MIP gap.
+    # initial_fleet (count per vehicle name) and initial_assignment (deliveries per vehicle
+    # name and category, as returned by assignment()) replace the last solution as the
+    # solver's starting incumbent.
+    def solve(self, demand, category_weights=None, costs=None, capacities=None,
+              weight_capacities=None, max_available=None, settings=None,
+              initial_fleet=None, initial_assignment=None):
+        for j, c in enumerate(self.categories):
+            if demand.get(c, 0) > 0 and not self.covered[j]:
+                return dict(self._result("Infeasible"), **{"Solve Time (s)": 0.0, "MIP Gap": None})
+
+        with self.lock:
+            with span("update_model"):
+                for j, c in enumerate(self.categories):
+                    if self.covered[j]:
+                        self.problem.constraints[self._demand_name(j)].changeRHS(demand.get(c, 0))
+
+                for i, (f, v) in enumerate(zip(self.fleet, self.vehicles)):
+                    name = v["name"]
+                    self.problem.objective[f] = (costs or {}).get(name, v["cost"])
+                    _expr(self.problem.constraints[self._capacity_name(i)])[f] = (capacities or {}).get(name, v["capacity"])
+                    f.upBound = (max_available or {}).get(name, v.get("max_available"))
+
+                if self.weighted:
+                    if category_weights is None:
+                        raise ValueError("category_weights is required when vehicles have a weight capacity")
+                    # Average kg per delivery of each category
+                    average = {
+                        c: (category_weights.get(c, 0) / demand[c]) if demand.get(c, 0) else 0.0
+                        for c in self.categories
+                    }
+                    for x, (i, j) in zip(self.assigned, self.pairs):
+                        if self.vehicles[i].get("weight_capacity") is not None:
+                            row = _expr(self.problem.constraints[self._weight_name(i)])
+                            row[x] = -average[self.categories[j]]
+                            row[self.fleet[i]] = (weight_capacities or {}).get(self.names[i], self.vehicles[i]["weight_capacity"])
+
+                if initial_fleet is not None:
+                    for name, f in zip(self.names, self.fleet):
+                        f.setInitialValue(initial_fleet.get(name, 0))
+                if initial_assignment is not None:
+                    for x, (i, j) in zip(self.assigned, self.pairs):
+                        x.setInitialValue(initial_assignment.get(self.names[i], {}).get(self.categories[j], 0))
+
+            status, report = solve_problem(self.problem, settings, warm_start=True)
+            return dict(self._result(status), **report)
+
+    def _result(self, status):
+        solved = status not in ("Infeasible", "Not Solved")
+        result = {"Status": status}
+        for name, f in zip(self.names, self.fleet):
+            result[name] = f.value() if solved else None
+        result["Total Cost"] = pulp.value(self.problem.objective) if solved else None
+        for i, name in enumerate(self.names):
+            carried = [x for x, (ii, _) in zip(self.assigned, self.pairs) if ii == i]
+            result[f"Deliveries assigned to {name}"] = pulp.value(pulp.lpSum(carried)) if solved and carried else (0.0 if solved else None)
+        return result
+
+    # Deliveries of each category assigned to each vehicle type in the last solve
+    def assignment(self):
+        table = {name: {} for name in self.names}
+        for x, (i, j) in zip(self.assigned, self.pairs):
+            table[self.names[i]][self.categories[j]] = x.value()
+        return table
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+# A FleetModel for this vehicle table and category list, built on first use and kept for
+# the life of the process (so it is reused across Streamlit reruns). Costs, capacities and
+# availability can still be changed per solve.
+def fleet_model(vehicles, categories):
+    key = (
+        tuple((v["name"], tuple(v["categories"]), v.get("weight_capacity") is not None) for v in vehicles),
+        tuple(categories),
+    )
+    with _models_lock:
+        if key not in _models:
+            _models[key] = FleetModel(vehicles, categories)
+        return _models[key]
+
+
+# Solve a vehicle table against a demand vector, reusing the cached model for the table's
+# structure and taking costs, capacities and availability from the table itself; an initial
+# fleet and assignment are passed on as the starting incumbent
+def solve_fleet(vehicles, demand, category_weights=None, categories=None, settings=None,
+                initial_fleet=None, initial_assignment=None):
+    categories = categories or sorted({c for v in vehicles for c in v["categories"]} | set(demand))
+    model = fleet_model(vehicles, categories)
+    return model.solve(
+        demand,
+        category_weights=category_weights,
+        costs={v["name"]: v["cost"] for v in vehicles},
+        capacities={v["name"]: v["capacity"] for v in vehicles},
+        weight_capacities={v["name"]: v["weight_capacity"] for v in vehicles if v.get("weight_capacity") is not None},
+        max_available={v["name"]: v.get("max_available") for v in vehicles},
+        settings=settings,
+        initial_fleet=initial_fleet,
+        initial_assignment=initial_assignment,
+    )
@@ -0,0 +1,514 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from job_queue import report_progress
+from parcel_packing import LOAD_VEHICLES
+from perf_trace import span
+from solve_cache import cached_solve
+from solver_config import DEFAULT_TIME_LIMIT, solve_problem, solver_settings
+
+# Backends the scenario functions can be solved with; "pulp" is still accepted as the
+# older name for "cbc"
+BACKENDS = ["native", "cbc", "highs", "crosscheck"]
+
+# Costs that differ by less than this are treated as the same optimum
+COST_TOLERANCE = 1e-6
+
+# The native enumeration looks at the clock once every this many candidate fleets
+DEADLINE_CHECK_STEPS = 4096
+
+# Native solves with at most this many candidate fleets (see native_candidates) take well
+# under a second and may run while a page waits; larger ones go to a background job
+INLINE_MAX_CANDIDATES = 100_000
+
+
+# Which delivery types each vehicle can carry
+VEHICLE_TYPES = {"V1": "CBA", "V2": "BA", "V3": "A"}
+
+
+# Vehicle table for the generic fleet model; None marks a vehicle not in the scenario
+def vehicle_table(costs, capacities):
+    return [
+        {"name": v, "cost": costs[v], "capacity": capacities[v], "categories": VEHICLE_TYPES[v]}
+        for v in VEHICLE_TYPES if capacities.get(v) is not None
+    ]
+
+
+# fleet_model builds PuLP models; it is imported on the first PuLP solve so apps that
+# only use the native solver never load PuLP
+def _solve_fleet(vehicles, demand, settings, initial_fleet=None, initial_assignment=None):
+    from fleet_model import solve_fleet
+    return solve_fleet(
+        vehicles, demand, categories="ABC", settings=settings,
+        initial_fleet=initial_fleet, initial_assignment=initial_assignment,
+    )
+
+
+# PuLP/CBC models for each scenario; initial_fleet and initial_assignment give a starting
+# solution (see FleetModel.solve)
+def pulp_scenario_1(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity, settings=None,
+                    initial_fleet=None, initial_assignment=None):
+    return _solve_fleet(
+        vehicle_table({"V1": cost_v1, "V2": cost_v2, "V3": cost_v3}, {"V1": v1_capacity, "V2": v2_capacity, "V3": v3_capacity}),
+        {"A": D_a, "B": D_b, "C": D_c},
+        settings, initial_fleet, initial_assignment,
+    )
+
+
+def pulp_scenario_2(D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity, settings=None,
+                    initial_fleet=None, initial_assignment=None):
+    return _solve_fleet(
+        vehicle_table({"V1": cost_v1, "V2": cost_v2}, {"V1": v1_capacity, "V2": v2_capacity}),
+        {"A": D_a, "B": D_b, "C": D_c},
+        settings, initial_fleet, initial_assignment,
+    )
+
+
+def pulp_scenario_3(D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity, settings=None,
+                    initial_fleet=None, initial_assignment=None):
+    return _solve_fleet(
+        vehicle_table({"V1": cost_v1, "V3": cost_v3}, {"V1": v1_capacity, "V3": v3_capacity}),
+        {"A": D_a, "B": D_b, "C": D_c},
+        settings, initial_fleet, initial_assignment,
+    )
+
+
+# Exact in-process solver for the nested three-vehicle model.
+# C deliveries only fit on V1, B on V1/V2 and A on any vehicle, so once the number of V1
+# and V2 vehicles is fixed the cheapest number of V3 vehicles follows directly. Pass None
+# for a vehicle that is not part of the scenario. upper_bound is the cost of a known fleet
+# (e.g. the greedy one); fleets already costing more are not enumerated.
+#
+# The enumeration grows with the demand divided by the capacities, so with a deadline (a
+# time.perf_counter() value) it stops there and returns the best fleet found so far, or
+# the greedy one, with Status "Not Solved".
+def native_fleet(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity, upper_bound=None,
+                 deadline=None):
+    total = D_a + D_b + D_c
+    best = None
+    limit = None if upper_bound is None else upper_bound + COST_TOLERANCE * max(1.0, abs(upper_bound))
+    steps = 0
+    timed_out = False
+
+    # More V1 vehicles than needed to carry everything never lowers the cost
+    v1_min = math.ceil(D_c / v1_capacity)
+    v1_max = max(v1_min, math.ceil(total / v1_capacity))
+    for v1 in range(v1_min, v1_max + 1):
+        steps += 1
+        if deadline is not None and steps % DEADLINE_CHECK_STEPS == 0 and time.perf_counter() > deadline:
+            timed_out = True
+            break
+        if limit is not None and cost_v1 * v1 > limit:
+            break
+        remaining = max(0, total - v1_capacity * v1)
+        # Capacity still needed for B once V1 has taken all of C
+        b_left = max(0, D_c + D_b - v1_capacity * v1)
+
+        if v2_capacity is None:
+            if b_left > 0:
+                continue
+            v2_options = [0]
+        else:
+            v2_min = math.ceil(b_left / v2_capacity)
+            v2_max = max(v2_min, math.ceil(remaining / v2_capacity))
+            v2_options = range(v2_min, v2_max + 1)
+
+        for v2 in v2_options:
+            steps += 1
+            if deadline is not None and steps % DEADLINE_CHECK_STEPS == 0 and time.perf_counter() > deadline:
+                timed_out = True
+                break
+            if limit is not None and cost_v1 * v1 + (cost_v2 or 0) * v2 > limit:
+                break
+            left = max(0, remaining - (v2_capacity or 0) * v2)
+            if v3_capacity is None:
+                if left > 0:
+                    continue
+                v3 = 0
+            else:
+                v3 = math.ceil(left / v3_capacity)
+
+            cost = cost_v1 * v1 + (cost_v2 or 0) * v2 + (cost_v3 or 0) * v3
+            candidate = (cost, v1 + v2 + v3, v1, v2, v3)
+            if best is None or candidate[:2] < best[:2]:
+                best = candidate
+        if timed_out:
+            break
+
+    if timed_out:
+        # The fleets seen so far may all be worse than the greedy one
+        fleet, _ = greedy_loading(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+        v1, v2, v3 = (fleet.get(v, 0) for v in VEHICLE_TYPES)
+        greedy = (cost_v1 * v1 + (cost_v2 or 0) * v2 + (cost_v3 or 0) * v3, v1 + v2 + v3, v1, v2, v3)
+        if best is None or greedy[:2] < best[:2]:
+            best = greedy
+    cost, _, v1, v2, v3 = best
+
+    # Same loading order as the PuLP constraints: V1 first, then V2, then V3
+    on_v1 = min(v1_capacity * v1, total)
+    on_v2 = min((v2_capacity or 0) * v2, total - on_v1)
+    on_v3 = total - on_v1 - on_v2
+
+    result = {
+        "Status": "Not Solved" if timed_out else "Optimal",
+        "V1": float(v1),
+        "V2": float(v2),
+        "V3": float(v3),
+        "Total Cost": float(cost),
+        "Deliveries assigned to V1": float(on_v1),
+        "Deliveries assigned to V2": float(on_v2),
+        "Deliveries assigned to V3": float(on_v3),
+    }
+    if v2_capacity is None:
+        del result["V2"], result["Deliveries assigned to V2"]
+    if v3_capacity is None:
+        del result["V3"], result["Deliveries assigned to V3"]
+    return result
+
+
+# Upper bound on the (V1, V2) pairs native_fleet enumerates for these inputs, before any
+# pruning by upper_bound
+def native_candidates(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
+    total = D_a + D_b + D_c
+    v1_options = max(0, math.ceil(total / v1_capacity) - math.ceil(D_c / v1_capacity)) + 1
+    v2_options = 1 if v2_capacity is None else math.ceil(total / v2_capacity) + 1
+    return v1_options * v2_options
+
+
+# Greedy fleet in closed form: C fills V1, then B and A fill the room left on the vehicles
+# already counted (V1 before V2 before V3) and the rest of each type goes on whole vehicles of
+# the type allowed to carry it with the lowest cost per delivery. With the default costs that
+# is V1 with C then B, V2 with B then A, and V3 with A. Returns the vehicle counts and the
+# deliveries of each type on each vehicle, in the format of FleetModel.assignment().
+def greedy_loading(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
+    costs = {"V1": cost_v1, "V2": cost_v2, "V3": cost_v3}
+    capacities = {"V1": v1_capacity, "V2": v2_capacity, "V3": v3_capacity}
+    vehicles = [v for v in VEHICLE_TYPES if capacities[v] is not None]
+    fleet = {v: 0 for v in vehicles}
+    assignment = {v: {c: 0 for c in VEHICLE_TYPES[v]} for v in vehicles}
+    room = {v: 0 for v in vehicles}
+
+    for category, demand in (("C", D_c), ("B", D_b), ("A", D_a)):
+        carriers = [v for v in vehicles if category in VEHICLE_TYPES[v]]
+        for v in carriers:
+            loaded = min(room[v], demand)
+            assignment[v][category] += loaded
+            room[v] -= loaded
+            demand -= loaded
+        if demand > 0:
+            v = min(carriers, key=lambda v: (costs[v] / capacities[v], vehicles.index(v)))
+            added = math.ceil(demand / capacities[v])
+            fleet[v] += added
+            assignment[v][category] += demand
+            room[v] += added * capacities[v] - demand
+    return fleet, assignment
+
+
+# Cost of the LP relaxation (fractional vehicles), a lower bound on any fleet's cost: each
+# delivery is carried at the lowest cost per delivery among the vehicles allowed to carry it
+def lp_lower_bound(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
+    costs = {"V1": cost_v1, "V2": cost_v2, "V3": cost_v3}
+    capacities = {"V1": v1_capacity, "V2": v2_capacity, "V3": v3_capacity}
+    per_delivery = {v: costs[v] / capacities[v] for v in VEHICLE_TYPES if capacities[v] is not None}
+    return float(sum(
+        demand * min(p for v, p in per_delivery.items() if category in VEHICLE_TYPES[v])
+        for category, demand in (("A", D_a), ("B", D_b), ("C", D_c))
+    ))
+
+
+# Provisional answer shown while the exact solve runs: the greedy fleet, the LP lower bound
+# and the relative gap between them (how far above the optimum the greedy cost can be at most)
+def greedy_fleet(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
+    args = (D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+    fleet, assignment = greedy_loading(*args)
+    costs = {"V1": cost_v1, "V2": cost_v2, "V3": cost_v3}
+    total_cost = float(sum(costs[v] * n for v, n in fleet.items()))
+    bound = lp_lower_bound(*args)
+
+    result = {"Status": "Heuristic"}
+    for v, n in fleet.items():
+        result[v] = float(n)
+    result["Total Cost"] = total_cost
+    for v, loads in assignment.items():
+        result[f"Deliveries assigned to {v}"] = float(sum(loads.values()))
+    result["Lower Bound"] = bound
+    result["Gap"] = abs(total_cost - bound) / max(abs(total_cost), 1e-10)
+    return result
+
+
+# Run both solvers and record whether they agree on the optimal cost
+def _crosscheck(native_result, pulp_result):
+    result = dict(native_result)
+    if pulp_result["Status"] != native_result["Status"]:
+        result["Cross-check"] = f"Mismatch: PuLP status {pulp_result['Status']}"
+    # PuLP reports None for an objective that is identically zero
+    elif abs((pulp_result["Total Cost"] or 0.0) - native_result["Total Cost"]) > COST_TOLERANCE * max(1.0, abs(native_result["Total Cost"])):
+        result["Cross-check"] = f"Mismatch: PuLP cost {pulp_result['Total Cost']}"
+    else:
+        result["Cross-check"] = "OK"
+    return result
+
+
+def _native(native_args, incumbent, time_limit):
+    with span("solve.native") as s:
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit else None
+        result = native_fleet(*native_args, upper_bound=incumbent, deadline=deadline)
+        s.set(status=result["Status"])
+    result["Solve Time (s)"] = time.perf_counter() - start
+    if result["Status"] == "Optimal":
+        # A finished enumeration is exhaustive, so the result is proven optimal
+        result["MIP Gap"] = 0.0
+    else:
+        # Stopped at the time limit: how far above the LP bound the fleet can be at most. A
+        # fleet that reaches the bound is optimal all the same.
+        bound = lp_lower_bound(*native_args)
+        result["MIP Gap"] = abs(result["Total Cost"] - bound) / max(abs(result["Total Cost"]), 1e-10)
+        if result["MIP Gap"] <= COST_TOLERANCE:
+            result["Status"], result["MIP Gap"] = "Optimal", 0.0
+    return result
+
+
+def _solve(backend, native_args, pulp_func, pulp_args, time_limit, gap, threads):
+    if backend == "pulp":
+        backend = "cbc"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    # Every exact solve starts from the greedy fleet: its cost bounds the native
+    # enumeration and the PuLP backends get it as their first incumbent
+    fleet, assignment = greedy_loading(*native_args)
+    costs = dict(zip(VEHICLE_TYPES, native_args[3:6]))
+    incumbent = sum(costs[v] * n for v, n in fleet.items())
+    if backend == "native":
+        return _native(native_args, incumbent, time_limit)
+    # The cross-check compares the native result against CBC
+    settings = solver_settings("cbc" if backend == "crosscheck" else backend, time_limit, gap, threads)
+    warm_start = {"initial_fleet": fleet, "initial_assignment": assignment}
+    if backend == "crosscheck":
+        return _crosscheck(_native(native_args, incumbent, time_limit), pulp_func(*pulp_args, settings=settings, **warm_start))
+    return pulp_func(*pulp_args, settings=settings, **warm_start)
+
+
+# Functions to run optimizations
+@cached_solve
+def optimize_scenario_1(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity, backend="native",
+                        time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    return _solve(
+        backend,
+        (D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity),
+        pulp_scenario_1,
+        (D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity),
+        time_limit, gap, threads,
+    )
+
+
+@cached_solve
+def optimize_scenario_2(D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity, backend="native",
+                        time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    return _solve(
+        backend,
+        (D_a, D_b, D_c, cost_v1, cost_v2, None, v1_capacity, v2_capacity, None),
+        pulp_scenario_2,
+        (D_a, D_b, D_c, cost_v1, cost_v2, v1_capacity, v2_capacity),
+        time_limit, gap, threads,
+    )
+
+
+@cached_solve
+def optimize_scenario_3(D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity, backend="native",
+                        time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    return _solve(
+        backend,
+        (D_a, D_b, D_c, cost_v1, None, cost_v3, v1_capacity, None, v3_capacity),
+        pulp_scenario_3,
+        (D_a, D_b, D_c, cost_v1, cost_v3, v1_capacity, v3_capacity),
+        time_limit, gap, threads,
+    )
+
+
+# Capacity arithmetic of the load optimization model, checked before any solver starts.
+# Each vehicle type carries one delivery type, so it needs at least enough vehicles for that
+# type's deliveries per day and for its weight. Returns "Feasible", the "Shortfalls" that
+# make it infeasible (the binding one per vehicle type) and the resulting "Bounds" on each
+# vehicle count (upper bound None when unlimited).
+def load_precheck(D_a, D_b, D_c, W_a, W_b, W_c, max_v1, max_v2, max_v3, vehicles=LOAD_VEHICLES):
+    demand = {"A": (D_a, W_a), "B": (D_b, W_b), "C": (D_c, W_c)}
+    limits = {"V1": max_v1, "V2": max_v2, "V3": max_v3}
+    shortfalls, bounds = [], {}
+    for v in vehicles:
+        (category,) = v["categories"]
+        deliveries, weight = demand[category]
+        for_deliveries = math.ceil(deliveries / v["capacity"])
+        for_weight = math.ceil(weight / v["weight_capacity"])
+        needed = max(for_deliveries, for_weight, 0)
+        limit = limits[v["name"]]
+        bounds[v["name"]] = (needed, limit)
+        if limit is not None and needed > limit:
+            if for_weight > for_deliveries:
+                reason = f"{weight:g} kg of Type {category} needs {needed} (at {v['weight_capacity']:g} kg each)"
+            else:
+                reason = f"{deliveries} Type {category} deliveries need {needed} (at {v['capacity']} per day each)"
+            shortfalls.append(f"{v['name']}: {reason}, but at most {limit} are available")
+    return {"Feasible": not shortfalls, "Shortfalls": shortfalls, "Bounds": bounds}
+
+
+# Define the load optimization function. backend is "cbc" or "highs"; the solve time and
+# achieved MIP gap are returned after the total cost.
+@cached_solve
+def load_optimization(D_a, D_b, D_c, W_a, W_b, W_c, max_v1, max_v2, max_v3, backend="cbc",
+                      time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    # New weight capacities
+    new_weight_capacity_v1 = 1000  # kg per day for v1
+    new_weight_capacity_v2 = 500   # kg per day for v2
+    new_weight_capacity_v3 = 60    # kg per day for v3
+
+    # New delivery capacities based on time constraints
+    v1_deliveries_per_day = 64
+    v2_deliveries_per_day = 66
+    v3_deliveries_per_day = 72
+
+    # New costs with incentive
+    cost_v1 = 62.8156
+    cost_v2 = 33
+    cost_v3 = 29.0536
+
+    # Inputs the vehicle limits cannot cover are infeasible without starting the solver
+    check = load_precheck(D_a, D_b, D_c, W_a, W_b, W_c, max_v1, max_v2, max_v3)
+    if not check["Feasible"]:
+        return "Infeasible", None, None, None, None, 0.0, None
+    bounds = check["Bounds"]
+
+    import pulp
+
+    # Create a linear programming problem
+    lp_problem = pulp.LpProblem("Delivery_Cost_Minimization", pulp.LpMinimize)
+
+    # Define decision variables, bounded by the precheck
+    V1 = pulp.LpVariable('V1', lowBound=bounds["V1"][0], upBound=bounds["V1"][1], cat='Integer')
+    V2 = pulp.LpVariable('V2', lowBound=bounds["V2"][0], upBound=bounds["V2"][1], cat='Integer')
+    V3 = pulp.LpVariable('V3', lowBound=bounds["V3"][0], upBound=bounds["V3"][1], cat='Integer')
+
+    # Objective function
+    lp_problem += cost_v1 * V1 + cost_v2 * V2 + cost_v3 * V3, "Total Cost"
+
+    # Constraints
+    lp_problem += v1_deliveries_per_day * V1 >= D_c, "V1_Delivery_Constraint"
+    lp_problem += v2_deliveries_per_day * V2 >= D_b, "V2_Delivery_Constraint"
+    lp_problem += v3_deliveries_per_day * V3 >= D_a, "V3_Delivery_Constraint"
+
+    lp_problem += new_weight_capacity_v1 * V1 >= W_c, "V1_Weight_Constraint"
+    lp_problem += new_weight_capacity_v2 * V2 >= W_b, "V2_Weight_Constraint"
+    lp_problem += new_weight_capacity_v3 * V3 >= W_a, "V3_Weight_Constraint"
+
+    # Manual input constraints for maximum number of each type of vehicle available
+    if max_v1 is not None:
+        lp_problem += V1 <= max_v1, "Max_V1_Constraint"
+    if max_v2 is not None:
+        lp_problem += V2 <= max_v2, "Max_V2_Constraint"
+    if max_v3 is not None:
+        lp_problem += V3 <= max_v3, "Max_V3_Constraint"
+
+    # Solve the problem
+    status, report = solve_problem(lp_problem, solver_settings(backend, time_limit, gap, threads))
+
+    # Results
+    V1_value = pulp.value(V1)
+    V2_value = pulp.value(V2)
+    V3_value = pulp.value(V3)
+    total_cost = pulp.value(lp_problem.objective)
+
+    return status, V1_value, V2_value, V3_value, total_cost, report["Solve Time (s)"], report["MIP Gap"]
+
+# Scenario names as shown in the app, with the solve function and the inputs it takes
+SCENARIOS = {
+    "Scenario 1: V1, V2, V3": (optimize_scenario_1, ("cost_v1", "cost_v2", "cost_v3", "v1_capacity", "v2_capacity", "v3_capacity")),
+    "Scenario 2: V1, V2": (optimize_scenario_2, ("cost_v1", "cost_v2", "v1_capacity", "v2_capacity")),
+    "Scenario 3: V1, V3": (optimize_scenario_3, ("cost_v1", "cost_v3", "v1_capacity", "v3_capacity")),
+}
+
+
+def _native_args(scenario, params):
+    _, inputs = SCENARIOS[scenario]
+    names = ("cost_v1", "cost_v2", "cost_v3", "v1_capacity", "v2_capacity", "v3_capacity")
+    return (params["D_a"], params["D_b"], params["D_c"]) + tuple(params[n] if n in inputs else None for n in names)
+
+
+# Greedy fleet of a scenario (see greedy_fleet) for the nine inputs in params
+def greedy_scenario(scenario, params):
+    return greedy_fleet(*_native_args(scenario, params))
+
+
+# Whether a native solve of a scenario for the nine inputs in params is small enough to
+# run while a page waits (see INLINE_MAX_CANDIDATES)
+def native_is_quick(scenario, params):
+    return native_candidates(*_native_args(scenario, params)) <= INLINE_MAX_CANDIDATES
+
+
+# Solve every scenario and return the results ranked by total cost, cheapest first.
+# PuLP solves run on a process pool so each CBC subprocess gets its own core; native
+# solves take microseconds and are run in-process.
+def solve_all_scenarios(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity, backend="native",
+                        max_workers=None, time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    options = {"backend": backend, "time_limit": time_limit, "gap": gap, "threads": threads}
+    calls = _scenario_calls(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+
+    with span("solve_all_scenarios", backend=backend):
+        results = {}
+        pending = {}
+        for name, (func, args) in calls.items():
+            key = func.cache_key(*args, **options)
+            cached = func.cache().get(key)
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending[name] = (func, args, key)
+
+        if backend == "native" or len(pending) <= 1:
+            for name, (func, args, key) in pending.items():
+                results[name] = func(*args, **options)
+                report_progress(len(results) / len(SCENARIOS), f"Solved {name}")
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers or len(pending)) as pool:
+                futures = {pool.submit(func, *args, **options): name for name, (func, args, key) in pending.items()}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    results[name] = future.result()
+                    func, args, key = pending[name]
+                    func.remember(results[name], *args, **options)
+                    report_progress(len(results) / len(SCENARIOS), f"Solved {name}")
+
+    ranked = [dict(results[name], Scenario=name) for name in SCENARIOS]
+    ranked.sort(key=lambda r: (r["Status"] != "Optimal", r["Total Cost"] if r["Total Cost"] is not None else 0.0))
+    return ranked
+
+
+def _scenario_calls(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity):
+    params = {
+        "cost_v1": cost_v1, "cost_v2": cost_v2, "cost_v3": cost_v3,
+        "v1_capacity": v1_capacity, "v2_capacity": v2_capacity, "v3_capacity": v3_capacity,
+    }
+    return {name: (func, (D_a, D_b, D_c) + tuple(params[p] for p in inputs)) for name, (func, inputs) in SCENARIOS.items()}
+
+
+# Whether every scenario's result for these inputs is already in the solve cache, so
+# solve_all_scenarios returns at once
+def scenarios_cached(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity, backend="native",
+                     time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    options = {"backend": backend, "time_limit": time_limit, "gap": gap, "threads": threads}
+    calls = _scenario_calls(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+    return all(func.cache().get(func.cache_key(*args, **options)) is not None for func, args in calls.values())
+
+
+# Keep the per-scenario results of a solve_all_scenarios call made in another process
+# (a background job) in this process's solve cache
+def _remember_ranked(ranked, D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity,
+                     backend="native", max_workers=None, time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    options = {"backend": backend, "time_limit": time_limit, "gap": gap, "threads": threads}
+    calls = _scenario_calls(D_a, D_b, D_c, cost_v1, cost_v2, cost_v3, v1_capacity, v2_capacity, v3_capacity)
+    for result in ranked:
+        func, args = calls[result["Scenario"]]
+        func.remember({k: v for k, v in result.items() if k != "Scenario"}, *args, **options)
+
+
+solve_all_scenarios.remember = _remember_ranked
@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pulp
+
+from fleet_model import FleetModel
+from fleet_optimizer import VEHICLE_TYPES, optimize_scenario_1
+from manifest_io import open_workbook
+from perf_trace import configure as configure_tracing, span, trace_run
+from plan_fleet import find_manifests, load_config
+
+
+# Demand of every day (sheet) of one depot's workbook, in sheet order, with None for
+# sheets without a weight column; runs in a worker process, which opens and hashes the
+# workbook once for all its sheets
+def read_demands(path):
+    workbook = open_workbook(path)
+    demands = {}
+    for sheet_name in workbook.sheet_names:
+        totals = workbook.delivery_totals(sheet_name)
+        demands[sheet_name] = None if totals is None else tuple(totals["counts"][t] for t in "ABC")
+    return demands
+
+
+# Solve one (depot, day) subproblem on its own
+def solve_subproblem(demand, config):
+    D_a, D_b, D_c = demand
+    return optimize_scenario_1(
+        D_a, D_b, D_c,
+        config["cost_v1"], config["cost_v2"], config["cost_v3"],
+        config["v1_capacity"], config["v2_capacity"], config["v3_capacity"],
+    )
+
+
+# Solve all depots of one day together, with the number of each vehicle type across
+# depots limited by the shared fleet. Model names use the depot's position (d0, d1, ...)
+# since depot names such as "Depot 1" and "Depot-1" would clash once PuLP replaces their
+# punctuation.
+def solve_coupled_day(demands, config, shared_fleet):
+    depots = list(demands)
+    vehicles, demand = [], {}
+    for d, depot in enumerate(depots):
+        D_a, D_b, D_c = demands[depot]
+        demand.update({f"d{d}|A": D_a, f"d{d}|B": D_b, f"d{d}|C": D_c})
+        for v, types in VEHICLE_TYPES.items():
+            n = v[1:]
+            vehicles.append({
+                "name": f"d{d}|{v}",
+                "cost": config[f"cost_v{n}"],
+                "capacity": config[f"v{n}_capacity"],
+                "categories": [f"d{d}|{t}" for t in types],
+            })
+
+    # Built per day rather than taken from the model cache, since it gets extra rows
+    model = FleetModel(vehicles, list(demand))
+    for v, limit in shared_fleet.items():
+        model.problem += pulp.lpSum(f for f, name in zip(model.fleet, model.names) if name.endswith(f"|{v}")) <= limit, f"Shared_{v}_Constraint"
+    result = model.solve(demand)
+
+    per_depot = {}
+    for d, depot in enumerate(depots):
+        row = {"Status": result["Status"]}
+        for v in VEHICLE_TYPES:
+            row[v] = result[f"d{d}|{v}"]
+        row["Total Cost"] = (
+            sum(row[v] * config[f"cost_v{v[1:]}"] for v in VEHICLE_TYPES) if row["V1"] is not None else None
+        )
+        per_depot[depot] = row
+    return per_depot
+
+
+def depot_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# Plan every (depot, day) in parallel. Each workbook is one depot and each sheet one day.
+# With a shared fleet ({"V1": 40, ...}), days whose independent plans together use more
+# vehicles of a type than exist are re-solved jointly across depots.
+def plan_horizon(paths, config, shared_fleet=None, max_workers=None):
+    shared_fleet = {v: limit for v, limit in (shared_fleet or {}).items() if limit is not None}
+    rows = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        with span("read_demands", depots=len(paths)):
+            demand_futures = {depot_name(path): pool.submit(read_demands, path) for path in paths}
+            demands = {
+                (depot, day): demand
+                for depot, future in demand_futures.items() for day, demand in future.result().items()
+            }
+
+        with span("solve_independent", subproblems=len(demands)):
+            solve_futures = {
+                key: pool.submit(solve_subproblem, demand, config)
+                for key, demand in demands.items() if demand is not None
+            }
+            for key, demand in demands.items():
+                if demand is None:
+                    rows[key] = {"Status": "Skipped: no 'Weight (KG)' column"}
+                else:
+                    rows[key] = dict(solve_futures[key].result(), Coupled=False)
+
+        # Days where the independent plans break the shared fleet limit
+        over = {}
+        for (depot, day), row in rows.items():
+            if "V1" in row:
+                over.setdefault(day, {})[depot] = demands[(depot, day)]
+        coupled_futures = {}
+        for day, day_demands in over.items():
+            used = {v: sum(rows[(d, day)][v] for d in day_demands) for v in shared_fleet}
+            if any(used[v] > shared_fleet[v] for v in shared_fleet):
+                coupled_futures[day] = pool.submit(solve_coupled_day, day_demands, config, shared_fleet)
+        with span("solve_coupled", days=len(coupled_futures)):
+            for day, future in coupled_futures.items():
+                for depot, row in future.result().items():
+                    rows[(depot, day)] = dict(row, Coupled=True)
+
+    table = []
+    for (depot, day), row in rows.items():
+        demand = demands[(depot, day)] or (None, None, None)
+        table.append({"Depot": depot, "Day": day, "D_a": demand[0], "D_b": demand[1], "D_c": demand[2], **row})
+    return pd.DataFrame(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan fleets for many depots over several days.")
+    parser.add_argument("manifest_dir", help="directory with one .xlsx workbook per depot and one sheet per day")
+    parser.add_argument("--config", help="JSON vehicle config; max_v1/max_v2/max_v3 cap the fleet shared by all depots each day")
+    parser.add_argument("--output", default="horizon_plan.csv", help="CSV file to write (default: horizon_plan.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--trace", help="append per-stage timing spans to this JSON lines file")
+    args = parser.parse_args(argv)
+    if args.trace:
+        configure_tracing(path=args.trace)
+
+    config = load_config(args.config)
+    paths = find_manifests(args.manifest_dir)
+    if not paths:
+        parser.error(f"no .xlsx workbooks found in {args.manifest_dir}")
+
+    shared_fleet = {"V1": config["max_v1"], "V2": config["max_v2"], "V3": config["max_v3"]}
+    with trace_run("horizon_planner"):
+        table = plan_horizon(paths, config, shared_fleet, args.workers)
+    table.to_csv(args.output, index=False)
+    print(f"wrote {len(table)} depot-days for {len(paths)} depots to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+import atexit
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from perf_trace import current_run, merge_spans, trace_run
+
+# Jobs running at once; each runs in a worker process so it can be cancelled mid-solve
+MAX_JOBS = int(os.environ.get("MAX_JOBS", min(4, os.cpu_count() or 1)))
+
+# Finished jobs kept for pick-up; older ones are dropped first
+MAX_FINISHED_JOBS = 100
+
+# A running job sends progress at most this often (seconds)
+PROGRESS_INTERVAL = 0.2
+
+# How often the apps check a running job (seconds)
+POLL_INTERVAL = 1.0
+
+# A job finishing within this many seconds of being started is shown on the same run,
+# without waiting for the first poll
+QUICK_JOB_WAIT = 0.5
+
+# Worker processes are started by a fork server rather than forked from the app: the app
+# runs many threads, and a fork taken while one of them holds a lock (the solve cache,
+# the model cache, a parsed workbook) would leave that lock held forever in the child
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Imported once in the fork server so new workers start with them loaded
+PRELOAD_MODULES = ["fleet_optimizer", "sweep", "parcel_packing"]
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+# Connection to the queue in a worker process; None everywhere else
+_progress_conn = None
+_last_progress = 0.0
+
+
+# Report how far the current job is (0-1); does nothing outside a job, so library code
+# can call it unconditionally
+def report_progress(fraction, message=None):
+    global _last_progress
+    if _progress_conn is None:
+        return
+    now = time.monotonic()
+    if fraction < 1 and now - _last_progress < PROGRESS_INTERVAL:
+        return
+    _last_progress = now
+    _progress_conn.send(("progress", float(fraction), message))
+
+
+# Entry point of a worker process. Workers run one job after another and keep their
+# module state (built PuLP models, solve caches) between jobs. A worker leads its own
+# process group, so cancelling a job also stops the CBC subprocesses and worker pools it
+# started; the worker itself is then replaced.
+def _worker_main(conn):
+    global _progress_conn, _last_progress
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    # Pools started by a job are forked from this single-threaded process, which keeps
+    # them in its process group
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork", force=True)
+    _progress_conn = conn
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+            continue
+        if task is None:
+            return
+
+        name, func, args, kwargs, trace = task
+        _last_progress = 0.0
+        try:
+            with trace_run(f"job.{name}", enabled=trace) as run:
+                result = func(*args, **kwargs)
+            conn.send(("result", result, run.records() if run is not None else []))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        # Not a daemon: jobs may start process pools of their own
+        self.process = context.Process(target=_worker_main, args=(child,), name="job-worker")
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except (AttributeError, OSError):
+            # No process groups here, or the worker has not called setpgrp yet
+            self.process.terminate()
+
+    def close(self):
+        self.process.join()
+        self.conn.close()
+
+
+class Job:
+    def __init__(self, name):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.spans = []
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._worker = None
+        self._finished_event = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    # Seconds since the job started, or its run time once finished
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+# Runs functions in background worker processes and keeps their status, progress and
+# result by job ID, so a Streamlit session can pick results up on a later rerun
+class JobQueue:
+    def __init__(self, max_jobs=MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context(START_METHOD)
+        if START_METHOD == "forkserver":
+            self._context.set_forkserver_preload(PRELOAD_MODULES)
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._idle = []
+        self._workers = set()
+        self._lock = threading.Lock()
+
+    # Queue func(*args, **kwargs) and return the job ID; func, its arguments and its result
+    # must be picklable. With trace, the job's timing spans are kept on the job. When func
+    # is a cached_solve function its result is also stored in this process's cache.
+    def submit(self, func, *args, name=None, trace=False, **kwargs):
+        job = Job(name or func.__name__)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            finished = [j for j in self._jobs.values() if j.done]
+            for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[old.job_id]
+        self._executor.submit(self._run, job, func, args, kwargs, trace)
+        return job.job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    # Wait up to timeout seconds for a job to finish; returns the job
+    def wait(self, job_id, timeout=None):
+        job = self.get(job_id)
+        if job is not None:
+            job._finished_event.wait(timeout)
+        return job
+
+    # Cancel a queued or running job; returns False if it had already finished
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job.status = CANCELLED
+            job.finished = time.time()
+            job._finished_event.set()
+            # Killed under the lock so the worker cannot have moved on to another job
+            if job._worker is not None:
+                job._worker.kill()
+        return True
+
+    # Stop every worker process
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._idle.clear()
+        for worker in workers:
+            worker.kill()
+            worker.close()
+
+    def _run(self, job, func, args, kwargs, trace):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            worker = self._idle.pop() if self._idle else None
+        if worker is None:
+            worker = _Worker(self._context)
+            with self._lock:
+                self._workers.add(worker)
+        with self._lock:
+            if job.status == CANCELLED:
+                self._idle.append(worker)
+                return
+            job.status = RUNNING
+            job.started = time.time()
+            job._worker = worker
+
+        # Read until the job reports its outcome; a dead worker (cancelled or crashed) is
+        # noticed by polling
+        outcome = None
+        try:
+            worker.conn.send((job.name, func, args, kwargs, trace))
+            while outcome is None:
+                if worker.conn.poll(0.1):
+                    message = worker.conn.recv()
+                    if message[0] == "progress":
+                        job.progress, job.message = message[1], message[2]
+                    else:
+                        outcome = message
+                elif not worker.process.is_alive() and not worker.conn.poll():
+                    break
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            # The task could not be sent, e.g. an argument that cannot be pickled
+            outcome = ("error", f"{type(e).__name__}: {e}", traceback.format_exc())
+
+        with self._lock:
+            job._worker = None
+            reusable = job.status != CANCELLED and worker.process.is_alive()
+            if reusable:
+                self._idle.append(worker)
+            else:
+                self._workers.discard(worker)
+        if not reusable:
+            worker.kill()
+            worker.close()
+
+        if outcome is not None and outcome[0] == "result" and hasattr(func, "remember"):
+            try:
+                func.remember(outcome[1], *args, **kwargs)
+            except Exception:
+                traceback.print_exc()
+
+        with self._lock:
+            if job.status != CANCELLED:
+                job.finished = time.time()
+                if outcome is not None and outcome[0] == "result":
+                    job.status, job.result, job.spans, job.progress = DONE, outcome[1], outcome[2], 1.0
+                elif outcome is not None:
+                    job.status, job.error = FAILED, outcome[1]
+                else:
+                    job.status, job.error = FAILED, f"Job process exited with code {worker.process.exitcode}"
+            job._finished_event.set()
+
+
+# Queue shared by every session of the app process
+default_queue = JobQueue()
+
+
+def configure(max_jobs=None):
+    global default_queue
+    default_queue.shutdown()
+    default_queue = JobQueue(max_jobs or MAX_JOBS)
+    return default_queue
+
+
+# Workers are not daemons, so they are stopped here rather than waited for at exit
+atexit.register(lambda: default_queue.shutdown())
+
+
+# Compute func(*args, **kwargs) for this Streamlit session and keep the context (e.g. the
+# inputs it was started with) in st.session_state[key]. A result already in func's solve
+# cache, or any result with inline=True (for solves that take less time than starting a
+# job), is computed right here; anything else becomes a background job. A job still
+# running under the key is cancelled since its result would be replaced.
+def start_job(key, func, *args, name=None, context=None, inline=False, **kwargs):
+    import streamlit as st
+
+    previous = st.session_state.get(key)
+    if previous is not None and "job_id" in previous:
+        default_queue.cancel(previous["job_id"])
+
+    if inline or (hasattr(func, "cache_key") and func.cache().get(func.cache_key(*args, **kwargs)) is not None):
+        st.session_state[key] = dict(context or {}, result=func(*args, **kwargs))
+        return
+
+    job_id = default_queue.submit(func, *args, name=name, trace=current_run() is not None, **kwargs)
+    st.session_state[key] = dict(context or {}, job_id=job_id)
+    default_queue.wait(job_id, QUICK_JOB_WAIT)
+
+
+# Show the job started under st.session_state[key]: progress and a cancel button while it
+# runs (refreshed every poll_interval seconds without rerunning the page), an error if it
+# failed. Once it is done its context and result (under "result") move to
+# st.session_state[result_key] and its timing spans join this run's, so call this above
+# the code that shows the result.
+def job_status(key, result_key, poll_interval=POLL_INTERVAL):
+    import streamlit as st
+
+    def current():
+        entry = st.session_state.get(key)
+        return entry, default_queue.get(entry["job_id"]) if entry and "job_id" in entry else None
+
+    entry, job = current()
+    if entry is None:
+        return
+    if "job_id" not in entry:
+        # Computed by start_job on this run
+        st.session_state[result_key] = entry
+        del st.session_state[key]
+    elif job is None:
+        # Lost with a server restart or dropped from the finished jobs
+        del st.session_state[key]
+    elif job.status == DONE:
+        st.session_state[result_key] = dict({k: v for k, v in entry.items() if k != "job_id"}, result=job.result)
+        del st.session_state[key]
+        merge_spans(job.spans)
+    elif job.status == FAILED:
+        st.error(f"{job.name} failed: {job.error}")
+    elif job.status == CANCELLED:
+        st.warning(f"{job.name} was cancelled.")
+    else:
+        @st.fragment(run_every=poll_interval)
+        def poll():
+            _, job = current()
+            if job is None or job.done:
+                st.rerun()
+            label = job.message or ("Waiting for a free worker" if job.status == QUEUED else "Running")
+            st.progress(job.progress, text=f"{job.name}: {label} ({job.elapsed():.0f} s)")
+            if st.button("Cancel", key=f"{key}_cancel"):
+                default_queue.cancel(job.job_id)
+                st.rerun()
+
+        poll()
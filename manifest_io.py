@@ -0,0 +1,304 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import openpyxl
+
+from perf_trace import span
+from weight_classes import DEFAULT_EDGES, classify_weights, combine_totals, weight_summary
+
+# Column holding the parcel weights in every manifest sheet
+WEIGHT_COLUMN = "Weight (KG)"
+
+# Number of parsed workbooks kept in memory
+MAX_WORKBOOKS = 4
+
+# Rows per chunk when streaming a sheet
+CHUNK_ROWS = 65536
+
+
+# Layout of the cached weight files; indexes written with another version are ignored and
+# their sheets extracted again. Version 2 stores the weights as float64 (version 1 rounded
+# them to float32, which moved weights such as 2.0000001 onto band edges); version 3 stores
+# TRUE/FALSE cells as missing rather than as 1 kg and 0 kg.
+CACHE_VERSION = 3
+
+# Directory for the columnar cache of extracted weights; set MANIFEST_CACHE_DIR to move
+# it, or to an empty string to turn it off
+MANIFEST_CACHE_DIR = os.environ.get(
+    "MANIFEST_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "load_optimization", "manifests")
+)
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+# Workbook parsed once per upload; sheet names, headers and the weight column of each
+# sheet are read on first use and reused afterwards. With a cache directory, the weights
+# are kept as float64 .npy files named by the workbook's content hash, and later loads
+# memory-map them instead of parsing the XML again.
+class ParsedWorkbook:
+    def __init__(self, data, digest, cache_dir=MANIFEST_CACHE_DIR):
+        self.digest = digest
+        self.size = len(data)
+        self._data = data
+        self._dir = os.path.join(cache_dir, digest) if cache_dir else None
+        self._book = None
+        self._arrays = {}
+        self._totals = {}
+        self._summaries = {}
+        self._lock = threading.RLock()
+
+        self._index = {"version": CACHE_VERSION, "sheet_names": None, "columns": {}, "weights": {}}
+        if self._dir:
+            try:
+                with open(os.path.join(self._dir, "index.json")) as f:
+                    index = json.load(f)
+                if index.get("version") == CACHE_VERSION:
+                    self._index = index
+            except (OSError, ValueError, AttributeError):
+                pass
+
+    def _save_index(self):
+        if self._dir:
+            os.makedirs(self._dir, exist_ok=True)
+            payload = json.dumps(self._index, default=str).encode("utf-8")
+            _write_atomic(os.path.join(self._dir, "index.json"), lambda f: f.write(payload))
+
+    # The read-only workbook, opened on first use; fully cached manifests never need it
+    def _workbook(self):
+        if self._book is None:
+            self._book, _ = _open_read_only(self._data)
+        return self._book
+
+    @property
+    def sheet_names(self):
+        with self._lock:
+            if self._index["sheet_names"] is None:
+                self._index["sheet_names"] = list(self._workbook().sheetnames)
+                self._save_index()
+            return self._index["sheet_names"]
+
+    # Header row of a sheet, without reading any data rows
+    def columns(self, sheet_name):
+        with self._lock:
+            if sheet_name not in self._index["columns"]:
+                self._index["columns"][sheet_name] = list(read_header(self._workbook(), sheet_name))
+                self._save_index()
+            return self._index["columns"][sheet_name]
+
+    # The 'Weight (KG)' column of a sheet as a float64 array (memory-mapped when cached on
+    # disk), or None when the sheet does not have one
+    def weight_array(self, sheet_name):
+        with self._lock:
+            if sheet_name in self._arrays:
+                return self._arrays[sheet_name]
+
+            if sheet_name not in self._index["weights"]:
+                self._index["weights"][sheet_name] = self._extract_weights(sheet_name)
+                self._save_index()
+
+            file_name = self._index["weights"][sheet_name]
+            if file_name and self._dir and not os.path.exists(os.path.join(self._dir, file_name)):
+                file_name = self._index["weights"][sheet_name] = self._extract_weights(sheet_name)
+                self._save_index()
+
+            if file_name is None:
+                array = None
+            elif self._dir:
+                with span("load_cached_weights", sheet=sheet_name):
+                    array = np.load(os.path.join(self._dir, file_name), mmap_mode="r")
+            else:
+                array = self._arrays.get(sheet_name)
+            self._arrays[sheet_name] = array
+            return array
+
+    # Stream the weight column once; returns the cache file name, or None if the sheet
+    # has no weight column
+    def _extract_weights(self, sheet_name):
+        if WEIGHT_COLUMN not in self.columns(sheet_name):
+            return None
+        with span("parse_weights", sheet=sheet_name, cached=bool(self._dir)):
+            return self._write_weights(sheet_name)
+
+    def _write_weights(self, sheet_name):
+        chunks = iter_weight_chunks(self._workbook(), sheet_name)
+        file_name = hashlib.sha256(sheet_name.encode("utf-8")).hexdigest()[:16] + ".npy"
+
+        if not self._dir:
+            self._arrays[sheet_name] = np.concatenate([np.zeros(0, dtype=np.float64)] + [c.astype(np.float64) for c in chunks])
+            return file_name
+
+        # Chunks go to a raw file first so memory stays flat, then get an .npy header. The
+        # weights keep full precision so classifying them gives the same result as the
+        # uncached and streaming paths.
+        os.makedirs(self._dir, exist_ok=True)
+        raw_path = os.path.join(self._dir, f"{file_name}.{os.getpid()}.raw")
+        rows = 0
+        with open(raw_path, "wb") as f:
+            for chunk in chunks:
+                chunk.astype(np.float64).tofile(f)
+                rows += len(chunk)
+
+        path = os.path.join(self._dir, file_name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(rows,))
+        raw = np.memmap(raw_path, dtype=np.float64, mode="r", shape=(rows,)) if rows else np.zeros(0, dtype=np.float64)
+        for start in range(0, rows, CHUNK_ROWS):
+            out[start:start + CHUNK_ROWS] = raw[start:start + CHUNK_ROWS]
+        out.flush()
+        del out, raw
+        os.replace(tmp_path, path)
+        os.remove(raw_path)
+        return file_name
+
+    # Per-type delivery counts and weight sums of a sheet, classified chunk by chunk
+    # without building a DataFrame; None when the sheet has no weight column
+    def delivery_totals(self, sheet_name, edges=DEFAULT_EDGES):
+        key = (sheet_name, tuple(edges))
+        with self._lock:
+            if key not in self._totals:
+                if not self._dir and sheet_name not in self._arrays:
+                    with span("stream_delivery_totals", sheet=sheet_name):
+                        self._totals[key] = stream_delivery_totals(self._workbook(), sheet_name, edges)
+                else:
+                    array = self.weight_array(sheet_name)
+                    if array is None:
+                        self._totals[key] = None
+                    else:
+                        with span("classify_weights", rows=len(array)):
+                            chunks = (array[i:i + CHUNK_ROWS] for i in range(0, len(array), CHUNK_ROWS))
+                            self._totals[key] = combine_totals(classify_weights(c, edges) for c in chunks) or classify_weights([], edges)
+            return self._totals[key]
+
+    # Row count, band totals and per-band weight histograms of a sheet (see weight_summary),
+    # computed once per sheet; None when the sheet has no weight column
+    def weight_summary(self, sheet_name, edges=DEFAULT_EDGES):
+        key = (sheet_name, tuple(edges))
+        with self._lock:
+            if key not in self._summaries:
+                array = self.weight_array(sheet_name)
+                if array is None:
+                    self._summaries[key] = None
+                else:
+                    with span("weight_summary", rows=len(array)):
+                        self._summaries[key] = weight_summary(array, edges, chunk_rows=CHUNK_ROWS)
+            return self._summaries[key]
+
+
+_workbooks = OrderedDict()
+_workbooks_lock = threading.Lock()
+
+
+def _read_bytes(file):
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "read"):
+        if hasattr(file, "seek"):
+            file.seek(0)
+        return file.read()
+    with open(file, "rb") as f:
+        return f.read()
+
+
+# Parsed workbook for an upload, a path or raw bytes, cached by content hash so the same
+# manifest is only parsed once however often it is selected or re-uploaded
+def open_workbook(file):
+    with span("read_upload"):
+        data = _read_bytes(file)
+        digest = hashlib.sha256(data).hexdigest()
+    with _workbooks_lock:
+        if digest in _workbooks:
+            _workbooks.move_to_end(digest)
+            return _workbooks[digest]
+
+    workbook = ParsedWorkbook(data, digest)
+    with _workbooks_lock:
+        _workbooks[digest] = workbook
+        while len(_workbooks) > MAX_WORKBOOKS:
+            _workbooks.popitem(last=False)
+    return workbook
+
+
+# Open a workbook in read-only mode; an already open workbook is passed through and left
+# open for the caller. Returns the workbook and whether it should be closed after use.
+def _open_read_only(file):
+    if isinstance(file, openpyxl.Workbook):
+        return file, False
+    if isinstance(file, (bytes, bytearray)):
+        file = io.BytesIO(file)
+    elif hasattr(file, "seek"):
+        file.seek(0)
+    return openpyxl.load_workbook(file, read_only=True, data_only=True), True
+
+
+# A weight cell as a number, parsing numeric text; TRUE/FALSE cells and anything else that
+# is not a number become NaN and are counted as missing
+def _to_float(value):
+    if isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Stream the 'Weight (KG)' column of a sheet in float64 chunks of at most chunk_rows
+# values, so memory stays flat however many rows the sheet has. The header must be in the
+# first row; yields nothing when the sheet has no weight column.
+def iter_weight_chunks(file, sheet_name, chunk_rows=CHUNK_ROWS):
+    book, owned = _open_read_only(file)
+    try:
+        # Header and data rows come from a single pass over the sheet XML
+        rows = book[sheet_name].iter_rows(values_only=True)
+        header = next(rows, ())
+        if WEIGHT_COLUMN not in header:
+            return
+        column = header.index(WEIGHT_COLUMN)
+
+        chunk = []
+        for row in rows:
+            chunk.append(_to_float(row[column]) if len(row) > column else np.nan)
+            if len(chunk) == chunk_rows:
+                yield np.array(chunk, dtype=np.float64)
+                chunk = []
+        if chunk:
+            yield np.array(chunk, dtype=np.float64)
+    finally:
+        if owned:
+            book.close()
+
+
+# First row of a sheet
+def read_header(file, sheet_name):
+    book, owned = _open_read_only(file)
+    try:
+        return next(book[sheet_name].iter_rows(values_only=True), ())
+    finally:
+        if owned:
+            book.close()
+
+
+def has_weight_column(file, sheet_name):
+    return WEIGHT_COLUMN in read_header(file, sheet_name)
+
+
+# Delivery counts and weight sums per type, updated chunk by chunk while streaming
+def stream_delivery_totals(file, sheet_name, edges=DEFAULT_EDGES, chunk_rows=CHUNK_ROWS):
+    if not has_weight_column(file, sheet_name):
+        return None
+
+    totals = combine_totals(classify_weights(chunk, edges) for chunk in iter_weight_chunks(file, sheet_name, chunk_rows))
+    return totals or classify_weights([], edges)
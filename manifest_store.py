@@ -0,0 +1,208 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from perf_trace import span
+
+# SQLite file holding the per-day delivery history; set MANIFEST_STORE to move it
+MANIFEST_STORE = os.environ.get(
+    "MANIFEST_STORE", os.path.join(os.path.expanduser("~"), ".cache", "load_optimization", "manifests.sqlite")
+)
+
+# One row per ingested manifest sheet, keyed by the workbook's content hash so the same
+# manifest is only ever stored once (ingesting it again moves it to the new depot and
+# day); counts and weight sums are pre-aggregated by type
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    digest TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    depot TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count_a INTEGER NOT NULL,
+    count_b INTEGER NOT NULL,
+    count_c INTEGER NOT NULL,
+    weight_a REAL NOT NULL,
+    weight_b REAL NOT NULL,
+    weight_c REAL NOT NULL,
+    out_of_range INTEGER NOT NULL,
+    missing INTEGER NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (digest, sheet)
+);
+CREATE INDEX IF NOT EXISTS deliveries_day ON deliveries (day);
+CREATE INDEX IF NOT EXISTS deliveries_depot_day ON deliveries (depot, day);
+"""
+
+CATEGORIES = ("A", "B", "C")
+
+
+# Date of a sheet named like "2024-05-01", or None
+def sheet_day(sheet_name):
+    try:
+        return datetime.date.fromisoformat(sheet_name.strip()).isoformat()
+    except ValueError:
+        return None
+
+
+def _as_day(day):
+    if isinstance(day, (datetime.date, datetime.datetime)):
+        return day.strftime("%Y-%m-%d")
+    return datetime.date.fromisoformat(day).isoformat()
+
+
+# Store of daily delivery counts per depot
+class ManifestStore:
+    def __init__(self, path=MANIFEST_STORE):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    # Record one sheet of a parsed workbook as the deliveries of a depot on a day. A sheet
+    # already stored keeps its counts but takes the new depot and day, so a wrong one can
+    # be corrected by ingesting it again. Returns False when nothing changed or the sheet
+    # has no weight column.
+    def ingest(self, workbook, sheet_name, depot, day):
+        day = _as_day(day)
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT depot, day FROM deliveries WHERE digest = ? AND sheet = ?", (workbook.digest, sheet_name)
+            ).fetchone()
+        if stored is not None:
+            if stored == (depot, day):
+                return False
+            with span("store_manifest", sheet=sheet_name, update=True), self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE deliveries SET depot = ?, day = ?, ingested_at = ? WHERE digest = ? AND sheet = ?",
+                    (depot, day, time.time(), workbook.digest, sheet_name),
+                )
+            return True
+        totals = workbook.delivery_totals(sheet_name)
+        if totals is None:
+            return False
+        row = (
+            workbook.digest, sheet_name, depot, day,
+            *(totals["counts"][c] for c in CATEGORIES),
+            *(totals["weights"][c] for c in CATEGORIES),
+            totals["out_of_range"], totals["missing"], time.time(),
+        )
+        with span("store_manifest", sheet=sheet_name), self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO deliveries VALUES ({', '.join('?' * len(row))}) "
+                "ON CONFLICT (digest, sheet) DO UPDATE SET depot = excluded.depot, day = excluded.day, "
+                "ingested_at = excluded.ingested_at",
+                row,
+            )
+        return True
+
+    # Record every sheet of a workbook for a depot; sheets named by date are stored on that
+    # date and the rest on `day`. Returns the number of sheets added or corrected.
+    def ingest_workbook(self, workbook, depot, day=None):
+        stored = 0
+        for sheet_name in workbook.sheet_names:
+            sheet_date = sheet_day(sheet_name) or day
+            if sheet_date is None:
+                raise ValueError(f"Sheet {sheet_name!r} is not named by date; pass the day it covers")
+            stored += self.ingest(workbook, sheet_name, depot, sheet_date)
+        return stored
+
+    def depots(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT depot FROM deliveries ORDER BY depot")]
+
+    # Per-day totals, oldest first: (day, count_a, count_b, count_c, weight_a, weight_b,
+    # weight_c) summed over all manifests of the day, for one depot or all depots together.
+    # `days` keeps the last that many calendar days up to `end` (default: the latest day stored).
+    def daily_totals(self, depot=None, days=None, end=None):
+        where, params = [], []
+        if depot is not None:
+            where.append("depot = ?")
+            params.append(depot)
+        if days is not None:
+            if end is None:
+                with self._lock:
+                    end = self._conn.execute(
+                        "SELECT MAX(day) FROM deliveries" + (" WHERE depot = ?" if depot is not None else ""),
+                        params,
+                    ).fetchone()[0]
+                if end is None:
+                    return []
+            end = datetime.date.fromisoformat(_as_day(end))
+            where.append("day BETWEEN ? AND ?")
+            params += [(end - datetime.timedelta(days=days - 1)).isoformat(), end.isoformat()]
+        elif end is not None:
+            where.append("day <= ?")
+            params.append(_as_day(end))
+
+        query = (
+            "SELECT day, SUM(count_a), SUM(count_b), SUM(count_c), SUM(weight_a), SUM(weight_b), SUM(weight_c) "
+            "FROM deliveries" + (" WHERE " + " AND ".join(where) if where else "") + " GROUP BY day ORDER BY day"
+        )
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    # Daily (D_a, D_b, D_c) counts as an integer array, one row per stored day
+    def demand_history(self, depot=None, days=None, end=None):
+        rows = self.daily_totals(depot, days, end)
+        return np.array([r[1:4] for r in rows], dtype=np.int64).reshape(-1, 3)
+
+    # Percentile (0-100) of a type's daily deliveries over the last `days` days of history,
+    # e.g. demand_percentile("B", 90, days=90); None when there is no history
+    def demand_percentile(self, category, percentile, depot=None, days=None, end=None):
+        history = self.demand_history(depot, days, end)
+        if not len(history):
+            return None
+        return float(np.percentile(history[:, CATEGORIES.index(category)], percentile))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep and query the daily delivery history of the manifests.")
+    parser.add_argument("--store", default=MANIFEST_STORE, help=f"SQLite file (default: {MANIFEST_STORE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser(
+        "ingest",
+        help="add manifests to the store, or correct the depot and day of ones already stored; "
+        "each workbook is a depot unless --depot is given",
+    )
+    ingest.add_argument("manifest_dir", help="directory containing .xlsx manifests")
+    ingest.add_argument("--depot", help="depot of every manifest (default: the workbook's file name)")
+    ingest.add_argument("--day", help="date (YYYY-MM-DD) of sheets not named by date")
+
+    query = commands.add_parser("percentile", help="percentile of a type's daily deliveries")
+    query.add_argument("category", choices=CATEGORIES)
+    query.add_argument("percentile", type=float, help="0-100")
+    query.add_argument("--days", type=int, default=90, help="last days of history to use (default: 90)")
+    query.add_argument("--depot", help="one depot (default: all depots together)")
+    args = parser.parse_args(argv)
+
+    store = ManifestStore(args.store)
+    if args.command == "ingest":
+        from horizon_planner import depot_name
+        from manifest_io import open_workbook
+        from plan_fleet import find_manifests
+
+        paths = find_manifests(args.manifest_dir)
+        stored = sum(store.ingest_workbook(open_workbook(p), args.depot or depot_name(p), args.day) for p in paths)
+        print(f"stored {stored} sheets from {len(paths)} workbooks in {args.store}", file=sys.stderr)
+    else:
+        value = store.demand_percentile(args.category, args.percentile, args.depot, args.days)
+        if value is None:
+            sys.exit("no history stored")
+        print(value)
+
+
+if __name__ == "__main__":
+    main()
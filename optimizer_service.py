@@ -0,0 +1,367 @@
+import argparse
+import json
+import math
+import statistics
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fleet_optimizer import SCENARIOS, load_optimization, optimize_scenario_1, optimize_scenario_2, optimize_scenario_3
+from perf_trace import configure as configure_tracing, span, trace_run
+
+# Model names accepted in requests, with the solve function and its inputs in call order
+MODELS = {
+    "scenario_1": (optimize_scenario_1, ("D_a", "D_b", "D_c") + SCENARIOS["Scenario 1: V1, V2, V3"][1]),
+    "scenario_2": (optimize_scenario_2, ("D_a", "D_b", "D_c") + SCENARIOS["Scenario 2: V1, V2"][1]),
+    "scenario_3": (optimize_scenario_3, ("D_a", "D_b", "D_c") + SCENARIOS["Scenario 3: V1, V3"][1]),
+    "load": (load_optimization, ("D_a", "D_b", "D_c", "W_a", "W_b", "W_c", "max_v1", "max_v2", "max_v3")),
+}
+
+# "all" expands to the three scenarios and returns them ranked by cost
+SCENARIO_MODELS = {"scenario_1": "Scenario 1: V1, V2, V3", "scenario_2": "Scenario 2: V1, V2", "scenario_3": "Scenario 3: V1, V3"}
+
+# Solves waiting or running in the pool before new requests are turned away
+MAX_QUEUE_DEPTH = 1024
+
+# Number of recent request latencies kept for /metrics
+LATENCY_WINDOW = 2048
+
+# Largest delivery count of one type a request may ask for
+MAX_DELIVERIES = 10_000_000
+
+# Solver time limit (seconds) for requests that ask for more or none at all; every solver
+# stops by then, so a pool worker is never held longer than this by one solve
+MAX_TIME_LIMIT = 60.0
+
+# Seconds a request waits for each of its solves, queueing included, before giving up
+REQUEST_TIMEOUT = 300.0
+
+
+# Runs in a worker process; the parent handles caching
+def _solve(model, args, kwargs):
+    func, _ = MODELS[model]
+    return func.__wrapped__(*args, **kwargs)
+
+
+# Optional solver settings a request can pass in its params
+SOLVER_OPTIONS = ("backend", "time_limit", "gap", "threads")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+# Check a model's inputs and solver settings from a request's params and return the
+# (args, kwargs) to solve with; raises ValueError for values the solvers cannot take.
+# time_limit is capped at max_time_limit, which is also used when none is given.
+def solve_arguments(model, params, max_time_limit=MAX_TIME_LIMIT):
+    _, inputs = MODELS[model]
+    missing = [p for p in inputs if p not in params]
+    if missing:
+        raise ValueError(f"Model {model!r} is missing inputs {missing}")
+    for p in inputs:
+        value = params[p]
+        if p.startswith("max_v") and value is None:
+            continue
+        if not _is_number(value):
+            raise ValueError(f"{p} must be a finite number")
+        if p.startswith("D_") and not 0 <= value <= MAX_DELIVERIES:
+            raise ValueError(f"{p} must be between 0 and {MAX_DELIVERIES}")
+        if p.endswith("_capacity") and value <= 0:
+            raise ValueError(f"{p} must be positive")
+        if value < 0:
+            raise ValueError(f"{p} must not be negative")
+    args = tuple(params[p] for p in inputs)
+
+    kwargs = {option: params[option] for option in SOLVER_OPTIONS if option in params}
+    if not isinstance(kwargs.get("backend", ""), str):
+        raise ValueError("backend must be a string")
+    for option in ("time_limit", "gap"):
+        value = kwargs.get(option)
+        if value is not None and (not _is_number(value) or value < 0):
+            raise ValueError(f"{option} must be a non-negative number")
+    threads = kwargs.get("threads")
+    if threads is not None and (not isinstance(threads, int) or isinstance(threads, bool) or threads < 1):
+        raise ValueError("threads must be a positive integer")
+    kwargs["time_limit"] = min(kwargs.get("time_limit") or max_time_limit, max_time_limit)
+    return args, kwargs
+
+
+def _as_dict(model, result):
+    if model == "load":
+        status, V1, V2, V3, total_cost, solve_time, mip_gap = result
+        return {
+            "Status": status, "V1": V1, "V2": V2, "V3": V3, "Total Cost": total_cost,
+            "Solve Time (s)": solve_time, "MIP Gap": mip_gap,
+        }
+    return result
+
+
+class OptimizerService:
+    def __init__(self, workers=None, max_queue_depth=MAX_QUEUE_DEPTH, max_time_limit=MAX_TIME_LIMIT,
+                 request_timeout=REQUEST_TIMEOUT):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.max_queue_depth = max_queue_depth
+        self.max_time_limit = max_time_limit
+        self.request_timeout = request_timeout
+        self.queue_depth = 0
+        self.requests = 0
+        self.solves = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.pool_restarts = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    # Replace a pool that lost a worker process (e.g. killed by the OOM killer); every
+    # solve still in it fails, later ones go to the new pool
+    def _restart_pool(self, broken):
+        with self._lock:
+            if self.pool is not broken:
+                return
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            self.pool_restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        with self._lock:
+            self.queue_depth -= 1
+
+    # Submit a solve to the pool, restarting the pool first if it is broken; returns the
+    # pool and the future
+    def _pool_submit(self, model, args, kwargs):
+        pool = self.pool
+        try:
+            return pool, pool.submit(_solve, model, args, kwargs)
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            pool = self.pool
+            return pool, pool.submit(_solve, model, args, kwargs)
+
+    # Start one solve and return a callable that waits for its result dict
+    def _submit(self, model, params):
+        if model not in MODELS:
+            raise ValueError(f"Unknown model {model!r}, expected one of {sorted(MODELS) + ['all']}")
+        func, _ = MODELS[model]
+        args, kwargs = solve_arguments(model, params, self.max_time_limit)
+
+        cache = func.cache()
+        key = func.cache_key(*args, **kwargs)
+        cached = cache.get(key)
+        if cached is not None:
+            return lambda: _as_dict(model, cached)
+
+        with self._lock:
+            if self.queue_depth >= self.max_queue_depth:
+                self.rejected += 1
+                raise OverflowError("Solve queue is full")
+            self.queue_depth += 1
+            self.solves += 1
+        try:
+            pool, future = self._pool_submit(model, args, kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # The solve holds its queue slot until it finishes, even when its request gave up
+        future.add_done_callback(self._release)
+        deadline = time.monotonic() + self.request_timeout
+
+        def wait():
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"Solve did not finish within {self.request_timeout:g} s")
+            except BrokenProcessPool:
+                self._restart_pool(pool)
+                raise RuntimeError("A solver process crashed; the solver pool was restarted")
+            func.remember(result, *args, **kwargs)
+            return _as_dict(model, result)
+
+        return wait
+
+    # Solve a batch of {"model": ..., "params": {...}} items; all solves are submitted
+    # before any is awaited so a batch spreads over the pool
+    def solve_batch(self, items):
+        pending = []
+        for item in items:
+            model, params = item.get("model"), item.get("params", {})
+            try:
+                if model == "all":
+                    waits = {name: self._submit(short, params) for short, name in SCENARIO_MODELS.items()}
+                    pending.append(("all", waits))
+                else:
+                    pending.append((model, self._submit(model, params)))
+            except (ValueError, OverflowError) as e:
+                pending.append(("error", str(e)))
+
+        results = []
+        for model, wait in pending:
+            if model == "error":
+                results.append({"error": wait})
+            else:
+                try:
+                    if model == "all":
+                        ranked = [dict(w(), Scenario=name) for name, w in wait.items()]
+                        ranked.sort(key=lambda r: (r["Status"] != "Optimal", r["Total Cost"] or 0.0))
+                        results.append({"ranked": ranked})
+                    else:
+                        results.append(wait())
+                except Exception as e:
+                    results.append({"error": str(e)})
+        return results
+
+    def record(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            snapshot = {
+                "requests": self.requests,
+                "solves": self.solves,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "pool_restarts": self.pool_restarts,
+                "queue_depth": self.queue_depth,
+            }
+        if latencies:
+            snapshot["latency_ms"] = {
+                "mean": statistics.fmean(latencies) * 1000,
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+                "max": latencies[-1] * 1000,
+            }
+        snapshot["cache"] = optimize_scenario_1.cache().info()
+        return snapshot
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+# Whether a POST /optimize body is batched, and its {"model", "params"} items; raises
+# ValueError when the body does not have that shape
+def request_items(payload):
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    batched = "requests" in payload
+    items = payload["requests"] if batched else [payload]
+    if not isinstance(items, list):
+        raise ValueError('"requests" must be a list')
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"Request {i} must be a JSON object")
+        if not isinstance(item.get("model"), str):
+            raise ValueError(f'Request {i} needs a "model" name')
+        if not isinstance(item.get("params"), dict):
+            raise ValueError(f'Request {i} needs a "params" object')
+    return batched, items
+
+
+# The default listen backlog of 5 resets connections under concurrent load
+class OptimizerHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, service.metrics())
+            elif self.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "Not found"})
+
+        # POST /optimize with either one {"model", "params"} object or {"requests": [...]};
+        # anything unexpected still gets a 500 response instead of a dropped connection
+        def do_POST(self):
+            try:
+                self._optimize()
+            except Exception as e:
+                traceback.print_exc()
+                self._send(500, {"error": f"Internal error: {type(e).__name__}: {e}"})
+
+        def _optimize(self):
+            if self.path != "/optimize":
+                self._send(404, {"error": "Not found"})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                self._send(400, {"error": f"Invalid JSON: {e}"})
+                return
+            try:
+                batched, items = request_items(payload)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+
+            with trace_run("optimize"), span("solve_batch", items=len(items)):
+                results = service.solve_batch(items)
+            service.record(time.perf_counter() - start)
+            if all("error" in r for r in results) and any("full" in r["error"] for r in results):
+                self._send(503, {"results": results})
+            else:
+                self._send(200, {"results": results} if batched else results[0])
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the fleet optimizer over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: one per CPU)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE_DEPTH, help="solves allowed in the queue before returning 503")
+    parser.add_argument("--max-time-limit", type=float, default=MAX_TIME_LIMIT,
+                        help=f"solver time limit cap in seconds (default: {MAX_TIME_LIMIT:g})")
+    parser.add_argument("--request-timeout", type=float, default=REQUEST_TIMEOUT,
+                        help=f"seconds a request waits for a solve before failing (default: {REQUEST_TIMEOUT:g})")
+    parser.add_argument("--trace", help="append per-request timing spans to this JSON lines file")
+    args = parser.parse_args(argv)
+    if args.trace:
+        configure_tracing(path=args.trace)
+
+    service = OptimizerService(
+        workers=args.workers, max_queue_depth=args.max_queue,
+        max_time_limit=args.max_time_limit, request_timeout=args.request_timeout,
+    )
+    server = OptimizerHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving fleet optimizer on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
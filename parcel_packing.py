@@ -0,0 +1,212 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from weight_classes import OPEN_ENDED_EDGES, band_labels, bin_index
+
+# Vehicle types of the load optimization model; each carries one delivery type, as in
+# load_optimization (C on V1, B on V2, A on V3)
+LOAD_VEHICLES = [
+    {"name": "V1", "cost": 62.8156, "capacity": 64, "weight_capacity": 1000, "categories": "C"},
+    {"name": "V2", "cost": 33, "capacity": 66, "weight_capacity": 500, "categories": "B"},
+    {"name": "V3", "cost": 29.0536, "capacity": 72, "weight_capacity": 60, "categories": "A"},
+]
+
+# Vehicle types with at most this many parcels get the optional MILP refinement
+REFINE_MAX_PARCELS = 300
+
+# Slack for floating-point sums when checking the kg limit
+WEIGHT_TOLERANCE = 1e-9
+
+
+# Pack weights into vehicles by first-fit decreasing, with at most `capacity` parcels and
+# `weight_capacity` kg per vehicle.
+#
+# Parcels are taken heaviest first, and each goes into the first vehicle opened so far
+# that still has a free parcel slot and enough spare kg, or into a new vehicle. The first
+# such vehicle is found in a max-tree over the vehicles' spare kg (-1 once a vehicle's
+# parcel count is full), so each parcel costs O(log vehicles).
+#
+# A parcel heavier than every vehicle's spare kg opens a new vehicle, and so do all the
+# parcels after it until one fits an earlier vehicle. Those runs are filled a whole vehicle
+# at a time from the sorted weights' running sum, which is where most parcels of a large
+# manifest go.
+#
+# Returns the vehicle instance of each parcel (-1 for parcels heavier than
+# weight_capacity) and the number of vehicles used.
+def pack_parcels(weights, capacity, weight_capacity):
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(-weights, kind="stable")
+    order = order[weights[order] <= weight_capacity + WEIGHT_TOLERANCE]
+    instance = np.full(len(weights), -1, dtype=np.int64)
+    sorted_weights = weights[order]
+    n = len(order)
+    # Ascending copy and running sum of the sorted weights, for the whole-vehicle fills
+    negated = (-sorted_weights).tolist()
+    running = np.concatenate([[0.0], np.cumsum(sorted_weights)]).tolist()
+
+    # Leaves start at index `size`; the tree doubles when more vehicles are needed
+    size = 1
+    while size < packing_lower_bound(sorted_weights, capacity, weight_capacity) * 5 // 4 + 1:
+        size *= 2
+    tree = [-1.0] * (2 * size)
+    slots = [0] * size
+    assigned = np.empty(n, dtype=np.int64)
+    weight_list = sorted_weights.tolist()
+    used = 0
+    k = 0
+    while k < n:
+        w = weight_list[k]
+        need = w - WEIGHT_TOLERANCE
+        if tree[1] < need:
+            if used == size:
+                leaves = tree[size:]
+                size *= 2
+                tree = [-1.0] * size + leaves + [-1.0] * (size - len(leaves))
+                for node in range(size - 1, 0, -1):
+                    a, b = tree[2 * node], tree[2 * node + 1]
+                    tree[node] = a if a > b else b
+                slots += [0] * (size - len(slots))
+            vehicle = used
+            used += 1
+            # The new vehicle takes the following parcels while they fit it by count and kg
+            # and none of them fits an earlier vehicle
+            end = min(k + capacity, n)
+            end = min(end, bisect_right(running, running[k] + weight_capacity + WEIGHT_TOLERANCE) - 1)
+            if tree[1] >= 0:
+                end = min(end, bisect_left(negated, -(tree[1] + WEIGHT_TOLERANCE)))
+            end = max(end, k + 1)
+            assigned[k:end] = vehicle
+            room, left = weight_capacity - (running[end] - running[k]), capacity - (end - k)
+            k = end
+        else:
+            node = 1
+            while node < size:
+                node *= 2
+                if tree[node] < need:
+                    node += 1
+            vehicle, room, left = node - size, tree[node] - w, slots[node - size] - 1
+            assigned[k] = vehicle
+            k += 1
+        slots[vehicle] = left
+
+        node = vehicle + size
+        tree[node] = room if left > 0 else -1.0
+        node //= 2
+        while node:
+            a, b = tree[2 * node], tree[2 * node + 1]
+            best = a if a > b else b
+            if tree[node] == best:
+                break
+            tree[node] = best
+            node //= 2
+
+    instance[order] = assigned
+    return instance, used
+
+
+# Fewest vehicles any packing could use: by parcel count and by total kg
+def packing_lower_bound(weights, capacity, weight_capacity):
+    weights = np.asarray(weights, dtype=np.float64)
+    if not len(weights):
+        return 0
+    by_count = -(-len(weights) // capacity)
+    by_weight = int(np.ceil(weights.sum() / weight_capacity - WEIGHT_TOLERANCE))
+    return max(by_count, by_weight)
+
+
+# Exact bin packing for a small set of parcels with fewer vehicles than the heuristic
+# used; returns (instance, used) or None when it finds nothing better in the time limit
+def refine_packing(weights, capacity, weight_capacity, max_vehicles, time_limit=5):
+    import pulp
+
+    n = len(weights)
+    lower = packing_lower_bound(weights, capacity, weight_capacity)
+    if max_vehicles <= lower:
+        return None
+
+    problem = pulp.LpProblem("Parcel_Bin_Packing", pulp.LpMinimize)
+    bins = range(max_vehicles - 1)
+    used = [pulp.LpVariable(f"y_{b}", cat='Binary') for b in bins]
+    x = [[pulp.LpVariable(f"x_{i}_{b}", cat='Binary') for b in bins] for i in range(n)]
+
+    problem += pulp.lpSum(used), "Vehicles"
+    for i in range(n):
+        problem += pulp.lpSum(x[i]) == 1, f"Parcel_{i}"
+    for b in bins:
+        problem += pulp.lpSum(x[i][b] for i in range(n)) <= capacity * used[b], f"Count_{b}"
+        problem += pulp.lpSum(weights[i] * x[i][b] for i in range(n)) <= weight_capacity * used[b], f"Weight_{b}"
+        if b:
+            problem += used[b] <= used[b - 1], f"Order_{b}"
+    problem.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+
+    # With a time limit CBC may stop without any feasible packing
+    if any(v.value() is None for v in used):
+        return None
+    instance = np.array([max(bins, key=lambda b: x[i][b].value() or 0) for i in range(n)], dtype=np.int64)
+    # Renumber the vehicles actually used as 0..count-1
+    _, instance = np.unique(instance, return_inverse=True)
+    count = int(instance.max()) + 1 if n else 0
+    if count >= max_vehicles:
+        return None
+    return instance.astype(np.int64), count
+
+
+# Load every parcel onto a concrete vehicle. Each parcel goes to the first vehicle type
+# that carries its weight category (from edges); within a type the parcels are packed
+# by pack_parcels under both the kg and deliveries-per-day limits.
+#
+# Returns per-type vehicle counts, total cost and lower bounds, plus the vehicle type
+# index and instance number of every parcel (both -1 when a parcel could not be loaded).
+def load_parcels(weights, vehicles=LOAD_VEHICLES, edges=OPEN_ENDED_EDGES, refine=False):
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    labels = band_labels(edges)
+    category = bin_index(weights, edges) - 1
+
+    parcel_vehicle = np.full(len(weights), -1, dtype=np.int64)
+    parcel_instance = np.full(len(weights), -1, dtype=np.int64)
+    for j, label in enumerate(labels):
+        carriers = [i for i, v in enumerate(vehicles) if label in v["categories"]]
+        if carriers:
+            parcel_vehicle[category == j] = carriers[0]
+
+    result = {"Status": "Loaded"}
+    total_cost = 0.0
+    for i, v in enumerate(vehicles):
+        members = np.flatnonzero(parcel_vehicle == i)
+        instance, used = pack_parcels(weights[members], v["capacity"], v["weight_capacity"])
+        lower = packing_lower_bound(weights[members][instance >= 0], v["capacity"], v["weight_capacity"])
+
+        if refine and used > lower and len(members) <= REFINE_MAX_PARCELS and np.all(instance >= 0):
+            refined = refine_packing(weights[members], v["capacity"], v["weight_capacity"], used)
+            if refined is not None:
+                instance, used = refined
+
+        parcel_instance[members] = instance
+        parcel_vehicle[members[instance < 0]] = -1
+        result[v["name"]] = used
+        result[f"Lower bound {v['name']}"] = lower
+        total_cost += used * v["cost"]
+
+    unassigned = int(np.count_nonzero(parcel_vehicle < 0))
+    if unassigned:
+        result["Status"] = "Partially loaded"
+    result["Total Cost"] = total_cost
+    result["Unassigned parcels"] = unassigned
+    result["parcel_vehicle"] = parcel_vehicle
+    result["parcel_instance"] = parcel_instance
+    return result
+
+
+# One row per loaded vehicle with its parcel count and kg, for display
+def vehicle_loads(weights, result, vehicles=LOAD_VEHICLES):
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    rows = []
+    for i, v in enumerate(vehicles):
+        mask = result["parcel_vehicle"] == i
+        instances = result["parcel_instance"][mask]
+        counts = np.bincount(instances, minlength=result[v["name"]])
+        loads = np.bincount(instances, weights=weights[mask], minlength=result[v["name"]])
+        for k in range(result[v["name"]]):
+            rows.append({"Vehicle": f"{v['name']}-{k + 1}", "Parcels": int(counts[k]), "Weight (KG)": float(loads[k])})
+    return rows
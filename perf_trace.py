@@ -0,0 +1,269 @@
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# PERF_TRACE=1 records timing spans for every run; PERF_TRACE=memory also tracks the peak
+# Python heap of each span with tracemalloc, which slows the traced code down noticeably
+PERF_TRACE = os.environ.get("PERF_TRACE", "")
+
+# Finished runs are appended to this file as JSON lines when it is set
+PERF_TRACE_FILE = os.environ.get("PERF_TRACE_FILE") or None
+
+_current = contextvars.ContextVar("perf_trace_run", default=None)
+
+
+def enabled_by_default():
+    return PERF_TRACE.lower() not in ("", "0", "false", "no")
+
+
+# Turn tracing on or off for this process and for worker processes started after the call
+def configure(enabled=True, path=None, memory=False):
+    global PERF_TRACE, PERF_TRACE_FILE
+    PERF_TRACE = ("memory" if memory else "1") if enabled else ""
+    PERF_TRACE_FILE = path
+    os.environ["PERF_TRACE"] = PERF_TRACE
+    if path:
+        os.environ["PERF_TRACE_FILE"] = path
+    else:
+        os.environ.pop("PERF_TRACE_FILE", None)
+
+
+# Process peak resident memory in MB for this process and for its largest finished child
+# (the CBC subprocess); ru_maxrss is in kB on Linux and bytes on macOS
+def _peak_rss():
+    if resource is None:
+        return None, None
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, run, name, attrs):
+        self.run = run
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        run = self.run
+        self.parent = run._stack[-1] if run._stack else None
+        self.depth = len(run._stack)
+        run._stack.append(self)
+        self.heap_peak = 0
+        if run.memory:
+            # Fold the heap peak so far into the enclosing span before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.heap_peak = max(self.parent.heap_peak, peak)
+            self.heap_start = current
+            tracemalloc.reset_peak()
+        self.rss_before = _peak_rss()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        run = self.run
+        run._stack.pop()
+        peak_rss, child_peak_rss = _peak_rss()
+        record = {
+            "run_id": run.run_id,
+            "run": run.name,
+            "span": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "depth": self.depth,
+            "start_s": self.start - run.start,
+            "duration_s": duration,
+            "peak_rss_mb": peak_rss,
+            "rss_growth_mb": (peak_rss - self.rss_before) if peak_rss is not None else None,
+            "child_peak_rss_mb": child_peak_rss,
+        }
+        if run.memory:
+            self.heap_peak = max(self.heap_peak, tracemalloc.get_traced_memory()[1])
+            # Peak Python heap above what was already allocated when the span started
+            record["heap_peak_mb"] = (self.heap_peak - self.heap_start) / 1024 / 1024
+            if self.parent is not None:
+                self.parent.heap_peak = max(self.parent.heap_peak, self.heap_peak)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        run.spans.append(record)
+        return False
+
+
+# One traced run (a Streamlit rerun, a CLI invocation or a service request). The run
+# itself is the root span; stages inside it are recorded with span().
+class Run:
+    def __init__(self, name, memory=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.memory = memory
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self._stack = []
+        self._root = _Span(self, name, {"timestamp": self.timestamp})
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._root.__enter__()
+        self.finished = False
+
+    def finish(self):
+        if self.finished:
+            return
+        while self._stack:
+            self._stack[-1].__exit__(None, None, None)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        self.finished = True
+
+    # Spans in the order they started, the root first
+    def records(self):
+        return sorted(self.spans, key=lambda r: r["start_s"])
+
+    def to_jsonl(self):
+        return "".join(json.dumps(r, default=str) + "\n" for r in self.records())
+
+    # Time of the root span not covered by any stage: widgets, rendering and anything else
+    # that was not wrapped in a span
+    def untracked_seconds(self):
+        elapsed = next((r["duration_s"] for r in self.spans if r["depth"] == 0), time.perf_counter() - self.start)
+        covered = sum(r["duration_s"] for r in self.spans if r["depth"] == 1 and not r.get("background"))
+        return max(0.0, elapsed - covered)
+
+
+# Record spans for this thread's code until finish_run; returns None when tracing is off
+def start_run(name, enabled=None, memory=None):
+    if enabled is None:
+        enabled = enabled_by_default()
+    if not enabled:
+        _current.set(None)
+        return None
+    if memory is None:
+        memory = PERF_TRACE.lower() == "memory"
+    run = Run(name, memory=memory)
+    _current.set(run)
+    return run
+
+
+# The run recording spans for this thread's code, or None when tracing is off
+def current_run():
+    return _current.get()
+
+
+# Add the spans of a run recorded in another process (e.g. a background job) to the current
+# run, nested under its innermost open span. They are marked as background work: their time
+# passed while this run was not executing, so it is not counted against the run, and they
+# are listed at the point of the run where they were merged.
+def merge_spans(records):
+    run = _current.get()
+    if run is None or not records:
+        return
+    offset = time.perf_counter() - run.start
+    depth = len(run._stack)
+    parent = run._stack[-1].name if run._stack else None
+    for i, r in enumerate(sorted(records, key=lambda r: r["start_s"])):
+        r = dict(r, run_id=run.run_id, run=run.name, depth=r["depth"] + depth, start_s=offset + i * 1e-9, background=True)
+        if r["depth"] == depth:
+            r["parent"] = parent
+        run.spans.append(r)
+
+
+def _append_jsonl(path, text):
+    # One write on an O_APPEND descriptor, so runs from worker processes do not interleave
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, text.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def finish_run(run):
+    if run is None:
+        return
+    run.finish()
+    if _current.get() is run:
+        _current.set(None)
+    if PERF_TRACE_FILE:
+        _append_jsonl(PERF_TRACE_FILE, run.to_jsonl())
+
+
+@contextlib.contextmanager
+def trace_run(name, enabled=None, memory=None):
+    previous = _current.get()
+    run = start_run(name, enabled, memory)
+    try:
+        yield run
+    finally:
+        finish_run(run)
+        _current.set(previous)
+
+
+# Time a stage of the current run. When no run is being traced this returns a shared
+# no-op object, so instrumented hot paths only pay for one context-variable lookup.
+def span(name, **attrs):
+    run = _current.get()
+    if run is None:
+        return _NULL_SPAN
+    return _Span(run, name, attrs)
+
+
+# Finish the run and show it in a collapsible "Performance" panel; call it at the end of
+# a Streamlit script
+def performance_panel(run):
+    import streamlit as st
+
+    if run is None:
+        return
+    finish_run(run)
+    with st.expander("Performance"):
+        records = run.records()
+        rows = [
+            {
+                "Stage": "· " * r["depth"] + r["span"],
+                "Time (ms)": round(r["duration_s"] * 1000, 2),
+                "Peak RSS (MB)": round(r["peak_rss_mb"], 1) if r["peak_rss_mb"] is not None else None,
+                "RSS growth (MB)": round(r["rss_growth_mb"], 1) if r["rss_growth_mb"] is not None else None,
+                **({"Heap peak (MB)": round(r["heap_peak_mb"], 2)} if "heap_peak_mb" in r else {}),
+            }
+            for r in records
+        ]
+        st.dataframe(rows)
+        st.write(f"Widgets, rendering and other untracked time: {run.untracked_seconds() * 1000:.1f} ms")
+        st.download_button(
+            "Download trace (JSON lines)",
+            run.to_jsonl(),
+            file_name=f"performance_{run.run_id}.jsonl",
+            mime="application/json",
+        )
@@ -0,0 +1,137 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from fleet_optimizer import BACKENDS, load_optimization, solve_all_scenarios
+from manifest_io import open_workbook
+from perf_trace import configure as configure_tracing, span, trace_run
+from solver_config import DEFAULT_TIME_LIMIT
+from weight_classes import DEFAULT_EDGES, OPEN_ENDED_EDGES
+
+# Vehicle settings used when the config file leaves them out; same defaults as the apps
+DEFAULT_CONFIG = {
+    "cost_v1": 2416.0,
+    "cost_v2": 1270.0,
+    "cost_v3": 1115.0,
+    "v1_capacity": 64,
+    "v2_capacity": 66,
+    "v3_capacity": 72,
+    "max_v1": None,
+    "max_v2": None,
+    "max_v3": None,
+}
+
+
+def load_config(path):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown vehicle config keys: {sorted(unknown)}")
+        config.update(overrides)
+    return config
+
+
+# Classify and solve every sheet of one manifest; runs in a worker process, traced as
+# its own run when tracing is on
+def plan_manifest(path, config, model="scenarios", backend="native", sheet_name=None,
+                  time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    with trace_run(f"plan_manifest:{os.path.basename(path)}"):
+        return _plan_sheets(path, config, model, backend, sheet_name, time_limit, gap, threads)
+
+
+def _plan_sheets(path, config, model, backend, sheet_name, time_limit, gap, threads):
+    workbook = open_workbook(path)
+    sheets = [sheet_name] if sheet_name else workbook.sheet_names
+    # The load model has no upper weight limit on Type C, like app5.py
+    edges = OPEN_ENDED_EDGES if model == "load" else DEFAULT_EDGES
+    rows = []
+    for sheet in sheets:
+        base = {"File": os.path.basename(path), "Sheet": sheet}
+        with span("delivery_totals", sheet=sheet):
+            totals = workbook.delivery_totals(sheet, edges)
+        if totals is None:
+            rows.append(dict(base, Status="Skipped: no 'Weight (KG)' column"))
+            continue
+
+        D_a, D_b, D_c = (totals["counts"][t] for t in "ABC")
+        base.update({"D_a": D_a, "D_b": D_b, "D_c": D_c, "Unclassified": totals["out_of_range"] + totals["missing"]})
+
+        if model == "load":
+            W_a, W_b, W_c = (totals["weights"][t] for t in "ABC")
+            # The load model has no native solver; the scenario-only backends fall back to CBC
+            status, V1, V2, V3, total_cost, solve_time, mip_gap = load_optimization(
+                D_a, D_b, D_c, W_a, W_b, W_c, config["max_v1"], config["max_v2"], config["max_v3"],
+                backend=backend if backend == "highs" else "cbc", time_limit=time_limit, gap=gap, threads=threads,
+            )
+            rows.append(dict(
+                base, W_a=W_a, W_b=W_b, W_c=W_c, Status=status, V1=V1, V2=V2, V3=V3,
+                **{"Total Cost": total_cost, "Solve Time (s)": solve_time, "MIP Gap": mip_gap},
+            ))
+        else:
+            ranked = solve_all_scenarios(
+                D_a, D_b, D_c,
+                config["cost_v1"], config["cost_v2"], config["cost_v3"],
+                config["v1_capacity"], config["v2_capacity"], config["v3_capacity"],
+                backend=backend, time_limit=time_limit, gap=gap, threads=threads,
+            )
+            for rank, result in enumerate(ranked, start=1):
+                rows.append(dict(base, Rank=rank, **result))
+    return rows
+
+
+def find_manifests(directory):
+    return sorted(p for p in glob.glob(os.path.join(directory, "*.xlsx")) if not os.path.basename(p).startswith("~$"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan fleets for a directory of delivery manifests without the Streamlit UI.")
+    parser.add_argument("manifest_dir", help="directory containing .xlsx manifests")
+    parser.add_argument("--config", help="JSON file with vehicle costs, capacities and max_v1/max_v2/max_v3")
+    parser.add_argument("--output", default="fleet_plan.csv", help="CSV file to write (default: fleet_plan.csv)")
+    parser.add_argument("--model", choices=["scenarios", "load"], default="scenarios",
+                        help="'scenarios' ranks the three vehicle scenarios; 'load' runs the weight-capacity load optimization")
+    parser.add_argument("--backend", choices=BACKENDS, default="native", help="solver for the scenario models")
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="wall-clock limit per MILP solve in seconds")
+    parser.add_argument("--gap", type=float, default=None, help="relative MIP gap at which a solve may stop")
+    parser.add_argument("--threads", type=int, default=None, help="threads per MILP solve")
+    parser.add_argument("--sheet", help="only plan this sheet of each manifest (default: all sheets)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--trace", help="append per-stage timing spans of every manifest to this JSON lines file")
+    args = parser.parse_args(argv)
+    if args.trace:
+        configure_tracing(path=args.trace)
+
+    config = load_config(args.config)
+    if args.model == "load" and None in (config["max_v1"], config["max_v2"], config["max_v3"]):
+        parser.error("--model load needs max_v1, max_v2 and max_v3 in the vehicle config")
+
+    paths = find_manifests(args.manifest_dir)
+    if not paths:
+        parser.error(f"no .xlsx manifests found in {args.manifest_dir}")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {path: pool.submit(
+                plan_manifest, path, config, args.model, args.backend, args.sheet, args.time_limit, args.gap, args.threads
+            ) for path in paths}
+        for path, future in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                rows.append({"File": os.path.basename(path), "Status": f"Error: {e}"})
+            print(f"planned {os.path.basename(path)}", file=sys.stderr)
+
+    pd.DataFrame(rows).to_csv(args.output, index=False)
+    print(f"wrote {len(rows)} rows for {len(paths)} manifests to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import math
+
+import numpy as np
+
+from fleet_optimizer import SCENARIOS, VEHICLE_TYPES
+from solve_cache import cached_solve
+from sweep import sweep
+
+# Deliveries on each side of the solved demand covered by the stored demand tables
+DEMAND_WINDOW = 200
+
+# Scenario input holding each category's demand
+DEMAND_INPUTS = {"A": "D_a", "B": "D_b", "C": "D_c"}
+
+
+def scenario_vehicles(scenario):
+    _, inputs = SCENARIOS[scenario]
+    return [v for v in VEHICLE_TYPES if f"{v.lower()}_capacity" in inputs]
+
+
+# Shadow prices of the Total_Deliveries_* rows in the LP relaxation: with fractional
+# vehicles each category is carried at the lowest cost per delivery among the vehicles
+# allowed to carry it
+def shadow_prices(params, vehicles):
+    per_delivery = {v: params[f"cost_{v.lower()}"] / params[f"{v.lower()}_capacity"] for v in vehicles}
+    return {c: min(per_delivery[v] for v in vehicles if c in VEHICLE_TYPES[v]) for c in "ABC"}
+
+
+# Every fleet that can be optimal for some non-negative costs, one row of (V1, V2, V3)
+# counts each: for each number of V1 and V2 vehicles, the fewest V3 vehicles that carry
+# the rest (the same enumeration as native_fleet)
+def candidate_fleets(params, vehicles):
+    D_a, D_b, D_c = params["D_a"], params["D_b"], params["D_c"]
+    total = D_a + D_b + D_c
+    cap1 = params["v1_capacity"]
+    cap2 = params["v2_capacity"] if "V2" in vehicles else None
+    cap3 = params["v3_capacity"] if "V3" in vehicles else None
+
+    v1_min = math.ceil(D_c / cap1)
+    v1 = np.arange(v1_min, max(v1_min, math.ceil(total / cap1)) + 1)
+    v2 = np.arange(math.ceil(total / cap2) + 1) if cap2 else np.zeros(1, dtype=np.int64)
+    v1, v2 = (a.ravel() for a in np.meshgrid(v1, v2, indexing="ij"))
+
+    # B must fit on V1 and V2 once V1 has taken all of C
+    feasible = cap1 * v1 + (cap2 or 0) * v2 >= D_b + D_c
+    left = np.maximum(0, total - cap1 * v1 - (cap2 or 0) * v2)
+    if cap3:
+        v3 = -(-left // cap3)
+    else:
+        v3 = np.zeros_like(left)
+        feasible &= left == 0
+    return np.stack([v1, v2, v3], axis=1)[feasible]
+
+
+# Cheapest candidate fleet for a cost vector, ties going to fewer vehicles like native_fleet
+def _best_fleet(fleets, costs):
+    totals = fleets @ costs
+    best = np.lexsort((fleets.sum(axis=1), totals))[0]
+    return fleets[best], float(totals[best])
+
+
+def _fleet_result(vehicles, fleet, total_cost):
+    result = {"Status": "Optimal"}
+    for i, v in enumerate(VEHICLE_TYPES):
+        if v in vehicles:
+            result[v] = float(fleet[i])
+    result["Total Cost"] = total_cost
+    return result
+
+
+def _cost_vector(params, vehicles):
+    return np.array([params[f"cost_{v.lower()}"] if v in vehicles else 0.0 for v in VEHICLE_TYPES], dtype=np.float64)
+
+
+# Sensitivity data for a scenario at the inputs in params (the nine sweep inputs):
+# - "Shadow prices": LP-relaxation cost of one more delivery of each category
+# - "Cost ranges": the interval each vehicle cost can move in with the fleet unchanged
+# - "Demand ranges" and "Breakpoints": the demand interval per category with the fleet
+#   unchanged, and every demand within DEMAND_WINDOW where the optimal fleet changes
+# The candidate fleets and per-category demand tables are kept so what_if() can answer
+# from them. Results are cached like the solves.
+@cached_solve
+def sensitivity_analysis(scenario, params, window=DEMAND_WINDOW):
+    vehicles = scenario_vehicles(scenario)
+    fleets = candidate_fleets(params, vehicles)
+    costs = _cost_vector(params, vehicles)
+    fleet, total_cost = _best_fleet(fleets, costs)
+
+    # Exact integer cost ranging: the current fleet stays cheapest while
+    # (c + d e_v) . fleet <= (c + d e_v) . other for every other candidate
+    slack = fleets @ costs - total_cost
+    cost_ranges = {}
+    for i, v in enumerate(VEHICLE_TYPES):
+        if v not in vehicles:
+            continue
+        more = fleets[:, i] - fleet[i]
+        lower = max([-costs[i]] + list(-slack[more > 0] / more[more > 0]))
+        upper = min([math.inf] + list(slack[more < 0] / -more[more < 0]))
+        cost_ranges[v] = (float(costs[i] + lower), float(costs[i] + upper))
+
+    demand_ranges, breakpoints, tables = {}, {}, {}
+    for category, name in DEMAND_INPUTS.items():
+        values = np.arange(max(0, params[name] - window), params[name] + window + 1)
+        table = sweep(scenario, params, {name: values})
+        mix = table[vehicles].to_numpy()
+        changed = np.any(mix[1:] != mix[:-1], axis=1)
+        breakpoints[category] = [int(d) for d in values[1:][changed]]
+
+        # Contiguous run of demands around the solved one with the same fleet
+        here = int(np.searchsorted(values, params[name]))
+        same = np.all(mix == mix[here], axis=1)
+        lo = here
+        while lo > 0 and same[lo - 1]:
+            lo -= 1
+        hi = here
+        while hi < len(values) - 1 and same[hi + 1]:
+            hi += 1
+        # A range that reaches the edge of the table may extend beyond it
+        demand_ranges[category] = (
+            int(values[lo]) if lo > 0 or values[0] == 0 else None,
+            int(values[hi]) if hi < len(values) - 1 else None,
+        )
+        tables[category] = {"Demand": values, **{c: table[c].to_numpy() for c in ["Status", "Total Cost"] + vehicles}}
+
+    return {
+        "Scenario": scenario,
+        "Params": dict(params),
+        "Result": _fleet_result(vehicles, fleet, total_cost),
+        "Shadow prices": shadow_prices(params, vehicles),
+        "Cost ranges": cost_ranges,
+        "Demand ranges": demand_ranges,
+        "Breakpoints": breakpoints,
+        "Candidate fleets": fleets,
+        "Demand tables": tables,
+    }
+
+
+# Answer "what if" for changes to the inputs (as differences, e.g. {"D_b": 20} or
+# {"cost_v2": 50}). Cost changes are answered from the candidate fleets and a single
+# demand change from the demand tables; anything else, or a demand outside the tables,
+# is re-solved. The result says which in "Answered from".
+def what_if(report, changes):
+    scenario, params = report["Scenario"], report["Params"]
+    vehicles = scenario_vehicles(scenario)
+    changes = {k: v for k, v in changes.items() if v}
+    unknown = set(changes) - set(params)
+    if unknown:
+        raise ValueError(f"Unknown inputs {sorted(unknown)}")
+    new_params = {k: params[k] + changes.get(k, 0) for k in params}
+    for k in changes:
+        if new_params[k] < (1 if k.endswith("_capacity") else 0):
+            raise ValueError(f"{k} would become {new_params[k]}")
+
+    if not changes:
+        return dict(report["Result"], **{"Answered from": "sensitivity data"})
+
+    if all(k.startswith("cost_") for k in changes):
+        fleet, total_cost = _best_fleet(report["Candidate fleets"], _cost_vector(new_params, vehicles))
+        return dict(_fleet_result(vehicles, fleet, total_cost), **{"Answered from": "sensitivity data"})
+
+    if len(changes) == 1:
+        (name,) = changes
+        category = next((c for c, n in DEMAND_INPUTS.items() if n == name), None)
+        if category is not None:
+            table = report["Demand tables"][category]
+            index = int(np.searchsorted(table["Demand"], new_params[name]))
+            if index < len(table["Demand"]) and table["Demand"][index] == new_params[name]:
+                result = {"Status": str(table["Status"][index])}
+                for v in vehicles:
+                    result[v] = float(table[v][index])
+                result["Total Cost"] = float(table["Total Cost"][index])
+                return dict(result, **{"Answered from": "sensitivity data"})
+
+    func, inputs = SCENARIOS[scenario]
+    result = func(new_params["D_a"], new_params["D_b"], new_params["D_c"], *(new_params[p] for p in inputs))
+    return dict(result, **{"Answered from": "re-solve"})
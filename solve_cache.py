@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from perf_trace import span
+
+# Achieved MIP gaps this far above the requested one still count as within it
+GAP_TOLERANCE = 1e-6
+
+# Default number of solve results kept in memory before the least recently used one is evicted
+DEFAULT_MAXSIZE = 256
+
+# Set SOLVE_CACHE_DIR to also keep solve results on disk between app restarts
+DEFAULT_CACHE_DIR = os.environ.get("SOLVE_CACHE_DIR")
+
+
+# Convert numpy scalars (e.g. counts coming out of a DataFrame) to plain Python values
+def _normalize(value):
+    if hasattr(value, "item") and not isinstance(value, (list, tuple, dict)):
+        try:
+            return value.item()
+        except (TypeError, ValueError):
+            return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+# In-memory LRU of solve results with an optional pickle directory behind it
+class SolveCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, cache_dir=DEFAULT_CACHE_DIR):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key_for(self, name, args, kwargs=None):
+        return (name, _normalize(args), _normalize(kwargs or {}))
+
+    def _path_for(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".pkl")
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._path_for(key), "rb") as f:
+                    stored_key, value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                stored_key = None
+            if stored_key == key:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path_for(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((key, value), f)
+            os.replace(tmp_path, path)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "cache_dir": self.cache_dir,
+            }
+
+
+# Shared by every decorated solve function; it lives as long as the Python process,
+# so it survives Streamlit reruns of the script
+default_cache = SolveCache()
+
+
+def configure(maxsize=None, cache_dir=None):
+    if maxsize is not None:
+        default_cache.maxsize = maxsize
+    if cache_dir is not None:
+        default_cache.cache_dir = cache_dir or None
+
+
+# Whether a solve result is final and can be kept: proven optimal within the requested
+# relative MIP gap (arguments["gap"]), or proven infeasible. A solve stopped by its time
+# limit ("Not Solved", or a feasible answer with a larger gap) is solved again next time.
+# Scenario result dicts and the tuples of load_optimization (status first, gap last) are
+# checked; other results are always kept.
+def is_final(result, arguments):
+    if isinstance(result, dict) and "Status" in result:
+        status, achieved = result["Status"], result.get("MIP Gap", 0.0)
+    elif isinstance(result, tuple) and result and isinstance(result[0], str):
+        status, achieved = result[0], result[-1]
+    else:
+        return True
+    if status == "Infeasible":
+        return True
+    return status == "Optimal" and achieved is not None and achieved <= (arguments.get("gap") or 0.0) + GAP_TOLERANCE
+
+
+# Decorator that returns a stored result when called again with the same inputs. Only
+# results for which should_cache(result, arguments) is true are stored; arguments maps
+# every parameter name of the function to its value in the call.
+def cached_solve(func=None, *, cache=None, should_cache=is_final):
+    if func is None:
+        return functools.partial(cached_solve, cache=cache, should_cache=should_cache)
+
+    # Streamlit runs every script as __main__, so the file name tells the apps apart
+    name = f"{os.path.basename(func.__code__.co_filename)}:{func.__name__}"
+    signature = inspect.signature(func)
+
+    # Store a result of func(*args, **kwargs) computed elsewhere (e.g. in a worker process)
+    def remember(result, *args, **kwargs):
+        call = signature.bind(*args, **kwargs)
+        call.apply_defaults()
+        if should_cache(result, call.arguments):
+            (cache or default_cache).put((cache or default_cache).key_for(name, args, kwargs), result)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__name__) as s:
+            store = cache or default_cache
+            key = store.key_for(name, args, kwargs)
+            result = store.get(key, _MISSING)
+            s.set(cache_hit=result is not _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                remember(result, *args, **kwargs)
+            return result
+
+    wrapper.cache_key = lambda *args, **kwargs: (cache or default_cache).key_for(name, args, kwargs)
+    wrapper.cache = lambda: cache or default_cache
+    wrapper.remember = remember
+    return wrapper
+
+
+_MISSING = object()
@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from perf_trace import span
+
+# PuLP is imported inside the functions that solve, so the apps can list backends and
+# validate settings without loading it
+
+# Solver backends a model can be solved with; "native" is the closed-form scenario
+# solver in fleet_optimizer and has no time limit, gap or threads to set
+SOLVER_BACKENDS = ["native", "cbc", "highs"]
+
+# Wall-clock limit in seconds for MILP solves, so one bad instance cannot hang a Streamlit
+# worker; set SOLVER_TIME_LIMIT=0 to solve without a limit
+DEFAULT_TIME_LIMIT = float(os.environ.get("SOLVER_TIME_LIMIT", 60)) or None
+
+
+# Validated solver settings as a plain dict, so they can be part of a solve cache key
+def solver_settings(backend="cbc", time_limit=DEFAULT_TIME_LIMIT, gap=None, threads=None):
+    if backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend {backend!r}, expected one of {SOLVER_BACKENDS}")
+    if backend == "highs" and not highs_available():
+        raise ValueError("The HiGHS backend needs the highspy package or a highs executable on PATH")
+    if time_limit is not None and time_limit <= 0:
+        raise ValueError("time_limit must be positive")
+    if gap is not None and not 0 <= gap < 1:
+        raise ValueError("gap must be a fraction between 0 and 1")
+    if threads is not None and threads < 1:
+        raise ValueError("threads must be at least 1")
+    return {"backend": backend, "time_limit": time_limit, "gap": gap, "threads": threads}
+
+
+def _highs_solver():
+    import pulp
+
+    if pulp.HiGHS().available():
+        return pulp.HiGHS
+    if pulp.HiGHS_CMD().available():
+        return pulp.HiGHS_CMD
+    return None
+
+
+# Cheap check that does not import PuLP; _highs_solver makes the final choice
+def highs_available():
+    return importlib.util.find_spec("highspy") is not None or shutil.which("highs") is not None
+
+
+# Backends that can run here, for the apps' solver pickers
+def available_backends():
+    return [b for b in SOLVER_BACKENDS if b != "highs" or highs_available()]
+
+
+def pulp_solver(settings, warm_start=False, log_path=None):
+    import pulp
+
+    options = {
+        "msg": False,
+        "timeLimit": settings["time_limit"],
+        "gapRel": settings["gap"],
+        "threads": settings["threads"],
+    }
+    if settings["backend"] == "highs":
+        return _highs_solver()(**options)
+    return pulp.PULP_CBC_CMD(warmStart=warm_start, logPath=log_path, **options)
+
+
+# CBC prints the gap rounded to two decimals, so work it out from the objective and bound
+def _cbc_gap(log_path):
+    try:
+        with open(log_path) as f:
+            log = f.read()
+    except OSError:
+        return None
+    objective = re.search(r"^Objective value:\s+(\S+)", log, re.M)
+    bound = re.search(r"^(?:Lower|Upper) bound:\s+(\S+)", log, re.M)
+    if objective is None or bound is None:
+        return None
+    objective, bound = float(objective.group(1)), float(bound.group(1))
+    return abs(objective - bound) / max(abs(objective), 1e-10)
+
+
+def _highs_gap(problem):
+    try:
+        return problem.solverModel.getInfo().mip_gap
+    except AttributeError:
+        return None
+
+
+# Solve a PuLP problem under the settings. Returns the status and the solve report:
+# "Solve Time (s)" and "MIP Gap" (0.0 when proven optimal, None when no solution was found
+# or the backend did not report one).
+def solve_problem(problem, settings=None, warm_start=False):
+    import pulp
+
+    settings = settings or solver_settings()
+    if settings["backend"] == "native":
+        raise ValueError("The native backend only covers the scenario models; choose cbc or highs")
+
+    log_path = None
+    if settings["backend"] == "cbc":
+        fd, log_path = tempfile.mkstemp(suffix=".log", prefix="cbc-")
+        os.close(fd)
+    try:
+        with span(f"solve.{settings['backend']}"):
+            start = time.perf_counter()
+            problem.solve(pulp_solver(settings, warm_start, log_path))
+            seconds = time.perf_counter() - start
+
+        if problem.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+            gap = None
+        elif settings["backend"] == "cbc":
+            gap = _cbc_gap(log_path)
+        else:
+            gap = _highs_gap(problem)
+        # No bound in the log means the search finished with nothing left to close
+        if gap is None and problem.sol_status == pulp.LpSolutionOptimal:
+            gap = 0.0
+    finally:
+        if log_path:
+            os.remove(log_path)
+
+    return pulp.LpStatus[problem.status], {"Solve Time (s)": seconds, "MIP Gap": gap}
@@ -0,0 +1,140 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fleet_optimizer import SCENARIOS
+from job_queue import report_progress
+from perf_trace import span
+
+# Inputs of optimize_scenario_1/2/3 that can be swept
+PARAMETERS = ("D_a", "D_b", "D_c", "cost_v1", "cost_v2", "cost_v3", "v1_capacity", "v2_capacity", "v3_capacity")
+INTEGER_PARAMETERS = ("D_a", "D_b", "D_c", "v1_capacity", "v2_capacity", "v3_capacity")
+
+# Upper bound on grid points x candidate fleets evaluated in one NumPy block
+MAX_BLOCK_CELLS = 4_000_000
+
+
+# Expand the swept ranges into one flat array per parameter (full Cartesian grid);
+# parameters without a range keep their value from base
+def parameter_grid(base, ranges):
+    unknown = set(ranges) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Cannot sweep {sorted(unknown)}, expected some of {PARAMETERS}")
+
+    swept = [p for p in PARAMETERS if p in ranges]
+    axes = [np.asarray(list(ranges[p])) for p in swept]
+    mesh = np.meshgrid(*axes, indexing="ij") if axes else []
+    size = int(np.prod([len(a) for a in axes])) if axes else 1
+
+    grid = {}
+    for p in PARAMETERS:
+        if p in ranges:
+            values = mesh[swept.index(p)].ravel()
+        else:
+            values = np.full(size, base[p])
+        grid[p] = values.astype(np.int64 if p in INTEGER_PARAMETERS else np.float64)
+    return grid
+
+
+# Solve the nested fleet model for every grid point at once by scoring all candidate
+# (V1, V2) counts in a NumPy block; V3 follows in closed form as in native_fleet
+def _evaluate_vectorized(grid, use_v2, use_v3):
+    D_a, D_b, D_c = grid["D_a"], grid["D_b"], grid["D_c"]
+    cap1, cap2, cap3 = grid["v1_capacity"], grid["v2_capacity"], grid["v3_capacity"]
+    cost1, cost2, cost3 = grid["cost_v1"], grid["cost_v2"], grid["cost_v3"]
+    total = D_a + D_b + D_c
+    size = len(total)
+
+    v1_values = np.arange(int((-(-total // cap1)).max(initial=0)) + 1)
+    v2_values = np.arange(int((-(-total // cap2)).max(initial=0)) + 1) if use_v2 else np.zeros(1, dtype=np.int64)
+    cand_v1, cand_v2 = (a.ravel() for a in np.meshgrid(v1_values, v2_values, indexing="ij"))
+
+    best_v1 = np.zeros(size, dtype=np.int64)
+    best_v2 = np.zeros(size, dtype=np.int64)
+    best_v3 = np.zeros(size, dtype=np.int64)
+    best_cost = np.full(size, np.inf)
+
+    rows = max(1, MAX_BLOCK_CELLS // len(cand_v1))
+    for start in range(0, size, rows):
+        s = slice(start, start + rows)
+        on_v1 = cap1[s, None] * cand_v1[None, :]
+        on_v2 = cap2[s, None] * cand_v2[None, :] if use_v2 else 0
+        feasible = (on_v1 >= D_c[s, None]) & (on_v1 + on_v2 >= (D_c + D_b)[s, None])
+
+        left = np.maximum(0, total[s, None] - on_v1 - on_v2)
+        if use_v3:
+            v3 = -(-left // cap3[s, None])
+        else:
+            feasible &= left == 0
+            v3 = np.zeros_like(left)
+
+        # Summed in native_fleet's order so equal costs come out bit-for-bit equal
+        cost = cost1[s, None] * cand_v1[None, :]
+        if use_v2:
+            cost = cost + cost2[s, None] * cand_v2[None, :]
+        cost = cost + cost3[s, None] * v3
+        cost = np.where(feasible, cost, np.inf)
+
+        # Ties go to the fewest vehicles, then to the first candidate in native_fleet's
+        # enumeration order (V1, then V2, ascending), so both pick the same fleet
+        cheapest = cost == cost.min(axis=1, initial=np.inf)[:, None]
+        vehicles = np.where(cheapest, cand_v1[None, :] + cand_v2[None, :] + v3, np.iinfo(np.int64).max)
+        pick = np.argmin(vehicles, axis=1)
+        picked = np.arange(len(pick))
+        best_v1[s] = cand_v1[pick]
+        best_v2[s] = cand_v2[pick]
+        best_v3[s] = v3[picked, pick]
+        best_cost[s] = cost[picked, pick]
+        report_progress(min(size, start + rows) / size, f"{min(size, start + rows)} of {size} points")
+
+    results = {"V1": best_v1.astype(float), "Total Cost": best_cost}
+    if use_v2:
+        results["V2"] = best_v2.astype(float)
+    if use_v3:
+        results["V3"] = best_v3.astype(float)
+    results["Status"] = np.where(np.isfinite(best_cost), "Optimal", "Infeasible")
+    return results
+
+
+def _evaluate_point(scenario, point, backend):
+    func, inputs = SCENARIOS[scenario]
+    args = (point["D_a"], point["D_b"], point["D_c"]) + tuple(point[p] for p in inputs)
+    return func(*args, backend=backend)
+
+
+# Solve each grid point with the scenario function on a worker pool; used for the PuLP
+# backends, which cannot be vectorized
+def _evaluate_pool(grid, scenario, backend, max_workers):
+    size = len(grid["D_a"])
+    points = [{p: grid[p][i].item() for p in PARAMETERS} for i in range(size)]
+    solved = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for result in pool.map(_evaluate_point, itertools.repeat(scenario), points, itertools.repeat(backend), chunksize=max(1, size // 64)):
+            solved.append(result)
+            report_progress(len(solved) / size, f"{len(solved)} of {size} points")
+
+    _, inputs = SCENARIOS[scenario]
+    columns = ["Status", "V1"] + [v for v in ("V2", "V3") if f"{v.lower()}_capacity" in inputs] + ["Total Cost"]
+    return {c: np.array([r[c] for r in solved]) for c in columns}
+
+
+# Solve a scenario over the full grid of swept inputs and return one row per grid point
+def sweep(scenario, base, ranges, backend="native", max_workers=None):
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario {scenario!r}")
+    _, inputs = SCENARIOS[scenario]
+    grid = parameter_grid(base, ranges)
+
+    with span("sweep", points=len(next(iter(grid.values()))), backend=backend):
+        if backend == "native":
+            results = _evaluate_vectorized(grid, "v2_capacity" in inputs, "v3_capacity" in inputs)
+        else:
+            results = _evaluate_pool(grid, scenario, backend, max_workers)
+
+    import pandas as pd
+
+    frame = pd.DataFrame({p: grid[p] for p in PARAMETERS if p in ranges})
+    for column, values in results.items():
+        frame[column] = values
+    return frame
@@ -0,0 +1,127 @@
+import string
+
+import numpy as np
+
+# Bin edges in kg for Type A (0-2], B (2-10] and C (10-200] deliveries; each bin excludes
+# its lower edge and includes its upper edge
+DEFAULT_EDGES = (0, 2, 10, 200)
+
+# Same bands with no upper limit on Type C, as used by the load optimization model
+OPEN_ENDED_EDGES = (0, 2, 10, float("inf"))
+
+
+# Category names for the bins between consecutive edges: A, B, C, ...
+def band_labels(edges):
+    return list(string.ascii_uppercase[:len(edges) - 1])
+
+
+# Bin of each weight: i means edges[i - 1] < weight <= edges[i], so 0 and len(edges) are
+# out of range (NaN also lands in len(edges))
+def bin_index(weights, edges=DEFAULT_EDGES):
+    return np.searchsorted(np.asarray(edges, dtype=np.float64), np.asarray(weights, dtype=np.float64), side="left")
+
+
+# Count and sum the weights falling into each bin in one vectorized pass.
+# Rows outside the outermost edges are reported as out_of_range, blank or
+# non-numeric rows as missing.
+def classify_weights(weights, edges=DEFAULT_EDGES, labels=None):
+    edges = np.asarray(edges, dtype=np.float64)
+    if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError(f"Bin edges must be strictly increasing, got {edges.tolist()}")
+    labels = labels or band_labels(edges)
+    if len(labels) != len(edges) - 1:
+        raise ValueError(f"Expected {len(edges) - 1} labels for {len(edges)} edges, got {len(labels)}")
+
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    missing = np.isnan(weights)
+    bins = bin_index(weights, edges)
+    bins[missing] = 0
+    counts = np.bincount(bins, minlength=len(edges) + 1)
+    sums = np.bincount(bins, weights=np.where(missing, 0.0, weights), minlength=len(edges) + 1)
+
+    n_missing = int(missing.sum())
+    return {
+        "counts": {label: int(n) for label, n in zip(labels, counts[1:-1])},
+        "weights": {label: float(w) for label, w in zip(labels, sums[1:-1])},
+        "out_of_range": int(counts[0] + counts[-1]) - n_missing,
+        "missing": n_missing,
+    }
+
+
+# Add up classification results, e.g. from the chunks of a streamed sheet
+def combine_totals(totals):
+    combined = None
+    for t in totals:
+        if combined is None:
+            combined = {"counts": dict(t["counts"]), "weights": dict(t["weights"]), "out_of_range": t["out_of_range"], "missing": t["missing"]}
+            continue
+        for label in combined["counts"]:
+            combined["counts"][label] += t["counts"][label]
+            combined["weights"][label] += t["weights"][label]
+        combined["out_of_range"] += t["out_of_range"]
+        combined["missing"] += t["missing"]
+    return combined
+
+
+# Equal-width histogram bins inside each band
+HISTOGRAM_BINS = 10
+
+
+# Histogram bin edges of each band: bins_per_band equal-width bins between its edges; an
+# open-ended band stops at `top` (e.g. the heaviest weight)
+def band_histogram_edges(edges, bins_per_band=HISTOGRAM_BINS, top=None):
+    edges = np.asarray(edges, dtype=np.float64)
+    result = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if np.isinf(hi):
+            hi = top if top is not None and top > lo else lo + 1
+        result.append(np.linspace(lo, hi, bins_per_band + 1))
+    return result
+
+
+# Summary of a weight column for previewing a manifest: row count, lightest and heaviest
+# weight, the per-band counts, weight sums, out_of_range and missing rows of
+# classify_weights, and a histogram inside each band. Weights are binned once into the
+# histogram bins of all bands, chunk by chunk, so memory does not grow with the column.
+def weight_summary(weights, edges=DEFAULT_EDGES, bins_per_band=HISTOGRAM_BINS, labels=None, chunk_rows=65536):
+    edges = np.asarray(edges, dtype=np.float64)
+    if edges.ndim != 1 or len(edges) < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError(f"Bin edges must be strictly increasing, got {edges.tolist()}")
+    labels = labels or band_labels(edges)
+    if len(labels) != len(edges) - 1:
+        raise ValueError(f"Expected {len(edges) - 1} labels for {len(edges)} edges, got {len(labels)}")
+
+    weights = np.asarray(weights).ravel()
+    # fmin/fmax skip NaN without copying the column
+    lightest = float(np.fmin.reduce(weights)) if len(weights) else float("nan")
+    heaviest = float(np.fmax.reduce(weights)) if len(weights) else float("nan")
+    band_edges = band_histogram_edges(edges, bins_per_band, top=heaviest if np.isfinite(heaviest) else None)
+    fine = np.concatenate([band_edges[0]] + [e[1:] for e in band_edges[1:]])
+
+    counts = np.zeros(len(fine) + 1, dtype=np.int64)
+    sums = np.zeros(len(fine) + 1)
+    n_missing = 0
+    for start in range(0, len(weights), chunk_rows):
+        chunk = np.asarray(weights[start:start + chunk_rows], dtype=np.float64)
+        missing = np.isnan(chunk)
+        bins = np.searchsorted(fine, chunk, side="left")
+        bins[missing] = 0
+        counts += np.bincount(bins, minlength=len(fine) + 1)
+        sums += np.bincount(bins, weights=np.where(missing, 0.0, chunk), minlength=len(fine) + 1)
+        n_missing += int(missing.sum())
+
+    # Bin i of band j is fine bin 1 + j * bins_per_band + i
+    band_counts = counts[1:-1].reshape(len(labels), bins_per_band)
+    band_sums = sums[1:-1].reshape(len(labels), bins_per_band).sum(axis=1)
+    return {
+        "rows": len(weights),
+        "min": lightest,
+        "max": heaviest,
+        "counts": {label: int(n) for label, n in zip(labels, band_counts.sum(axis=1))},
+        "weights": {label: float(w) for label, w in zip(labels, band_sums)},
+        "out_of_range": int(counts[0] + counts[-1]) - n_missing,
+        "missing": n_missing,
+        "histograms": {
+            label: {"edges": e.tolist(), "counts": c.tolist()} for label, e, c in zip(labels, band_edges, band_counts)
+        },
+    }